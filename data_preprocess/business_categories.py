@@ -0,0 +1,99 @@
+# business_categories.py - 按商家一次性判定 all / restaurant / drink 子样本，再按 business_id 广播到图片
+
+from typing import Tuple
+
+import pandas as pd
+
+DRINK_WORDS = ('bar', 'coffee', 'tea', 'cafe', 'pub')
+
+# 包含上面关键词但不是饮品店的类别（与 pic_all_res_drink_data_process.ipynb 中的列表相同）
+DRINK_EXCLUDE = frozenset([
+    "barre classes", "bartending schools", "team building activities", "barbers", 'cheesesteaks', 'steakhouses',
+    'barbeque', 'coffee roasteries', 'cabaret', 'internet cafes', 'bartenders', 'cafeteria',
+    'public services & government', 'musical instruments & teachers', 'public markets', 'striptease dancers',
+    'bar crawl', 'amateur sports teams', 'public art', 'public transportation', 'professional sports teams',
+    'hong kong style cafe',
+])
+
+
+def classify_categories(categories: pd.Series) -> pd.DataFrame:
+    """
+    对去重后的 categories 字符串判定 restaurant / drink
+
+    规则与 notebook 一致：
+    - restaurant：categories 中含 'restaurant'（不区分大小写）
+    - drink：不含 'sushi bar'，且至少有一个类别（按 ',' 拆分、lstrip、小写）含 bar/coffee/tea/cafe/pub
+      且不在 DRINK_EXCLUDE 中
+
+    返回:
+    -------
+    result : pd.DataFrame
+        以 categories 字符串为索引，列为 restaurant, drink（bool）
+    """
+    unique = pd.Series(pd.unique(categories.dropna()), dtype=object)
+    lower = unique.str.lower()
+
+    # 拆出所有出现过的类别，每个类别只判定一次
+    tokens = unique.str.split(',').explode()
+    tokens = tokens.str.lstrip().str.lower()
+    drink_tokens = {t for t in set(tokens) if t not in DRINK_EXCLUDE and any(w in t for w in DRINK_WORDS)}
+    verified = tokens.isin(drink_tokens).groupby(level=0).any()
+
+    result = pd.DataFrame({
+        'restaurant': lower.str.contains('restaurant', regex=False).to_numpy(),
+        'drink': (~lower.str.contains('sushi bar', regex=False) & verified).to_numpy(),
+    }, index=pd.Index(unique, name='categories'))
+    return result
+
+
+def classify_businesses(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    每个 business_id 判定一次
+
+    参数:
+    -------
+    df : pd.DataFrame
+        含 business_id, is_open, categories 列（商家表或图片表均可）
+
+    返回:
+    -------
+    result : pd.DataFrame
+        business_id, open, restaurant, drink；restaurant / drink 只对营业中的商家为 True
+    """
+    business = df[['business_id', 'is_open', 'categories']].drop_duplicates('business_id')
+    flags = classify_categories(business['categories'])
+    is_open = (business['is_open'] == 1).to_numpy()
+    restaurant = business['categories'].map(flags['restaurant']).fillna(False).astype(bool).to_numpy()
+    drink = business['categories'].map(flags['drink']).fillna(False).astype(bool).to_numpy()
+    return pd.DataFrame({'business_id': business['business_id'].to_numpy(),
+                         'open': is_open,
+                         'restaurant': is_open & restaurant,
+                         'drink': is_open & drink})
+
+
+def split_samples(pic_df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    替代 notebook 中的三次正则扫描和 iterrows 校验，得到 open_pic_new / restaurant_new / drink_new
+
+    返回:
+    -------
+    open_df, res_df, drink_df : pd.DataFrame
+        行顺序与 pic_df 一致；drink_df 不再带 cate_new / mark 两个中间列
+    """
+    flags = classify_businesses(pic_df).set_index('business_id')
+    business_id = pic_df['business_id']
+    is_open = business_id.map(flags['open']).to_numpy(dtype=bool)
+    restaurant = business_id.map(flags['restaurant']).to_numpy(dtype=bool)
+    drink = business_id.map(flags['drink']).to_numpy(dtype=bool)
+    return pic_df[is_open], pic_df[restaurant], pic_df[drink]
+
+
+if __name__ == "__main__":
+    # python business_categories.py
+    df = pd.read_excel("data/input/pic_feature.xlsx")
+    open_df, res_df, drink_df = split_samples(df)
+    print("total pic: {}".format(len(df)), "open pic: {}".format(len(open_df)),
+          "resturant pic: {}".format(len(res_df)), "drink pic: {}".format(len(drink_df)), sep="\n")
+    open_df.to_excel('data/output/open_pic_new.xlsx', index=False)
+    res_df.to_excel('data/output/restaurant_new.xlsx', index=False)
+    drink_df.to_excel('data/output/drink_new.xlsx', index=False)
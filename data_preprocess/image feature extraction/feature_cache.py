@@ -0,0 +1,392 @@
+# feature_cache.py - 图片特征的持久化缓存（按 photo_id + 文件内容哈希 + 抽取器版本）
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from functools import cached_property
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+import pandas as pd
+
+from image_features import (color_uniqueness, count_smiling_faces, decode_gray, decode_image, hsv_means,
+                            laplacian_sharpness, read_image_bytes)
+
+
+class Photo:
+    """
+    传给抽取器的单张图片，解码结果按需计算并缓存
+
+    多个 OpenCV 抽取器共用同一次解码；只有缓存全部命中的图片完全不会被解码。
+    """
+
+    def __init__(self, photo_id: str, path: str):
+        self.photo_id = photo_id
+        self.path = path
+
+    @cached_property
+    def buf(self) -> np.ndarray:
+        return read_image_bytes(self.path)
+
+    @cached_property
+    def bgr(self) -> np.ndarray:
+        return decode_image(self.path, self.buf)
+
+    @cached_property
+    def hsv(self) -> np.ndarray:
+        return cv2.cvtColor(self.bgr, cv2.COLOR_BGR2HSV)
+
+    @cached_property
+    def gray(self) -> np.ndarray:
+        return cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY)
+
+    @cached_property
+    def decoded_gray(self) -> np.ndarray:
+        # sharpness 与原来一样用 IMREAD_GRAYSCALE 解码的灰度图（与 cvtColor 的结果约有 1% 差异）
+        return decode_gray(self.path, self.buf)
+
+
+class Extractor(NamedTuple):
+    """
+    一个特征抽取器
+
+    name : 缓存中的抽取器名
+    version : 版本号，抽取逻辑或模型变化时修改，旧结果随即失效
+    fields : fn 返回的 dict 中的键，即结果表中该抽取器的列（全部图片都失败时列也存在）
+    fn : 单张模式 fn(Photo) -> dict；批量模式 fn(List[Photo]) -> List[dict]
+    batch : 是否为批量模式（模型类抽取器，如 memory_score / YOLO / 美学分）
+    """
+    name: str
+    version: str
+    fields: Tuple[str, ...]
+    fn: Callable
+    batch: bool = False
+
+
+def _hsv_features(photo: Photo) -> Dict:
+    h, s, v = hsv_means(photo.hsv)
+    return {'average_hue': h, 'average_saturation': s, 'average_value': v}
+
+
+def _face_features(photo: Photo) -> Dict:
+    number_face, smiling_faces_count = count_smiling_faces(photo.gray)
+    return {'number_face': number_face, 'smiling_faces_count': smiling_faces_count}
+
+
+# generate_result.xlsx 中的 OpenCV 特征
+DEFAULT_EXTRACTORS = [
+    Extractor('hsv', '1', ('average_hue', 'average_saturation', 'average_value'), _hsv_features),
+    Extractor('sharpness', '2', ('sharpness_measure',),
+              lambda photo: {'sharpness_measure': laplacian_sharpness(photo.decoded_gray)}),
+    Extractor('faces', '1', ('number_face', 'smiling_faces_count'), _face_features),
+    Extractor('uniqueness', '1', ('uniqueness_score',), lambda photo: {'uniqueness_score': color_uniqueness(photo.hsv)}),
+]
+
+# 缓存中表示“该版本的抽取器在这份文件内容上失败过”的值
+FAILED = None
+
+
+def memorability_extractor(scorer, version: str = 'resmem-1') -> Extractor:
+    """把 memorability_scoring.MemorabilityScorer 包装成批量抽取器"""
+    def score(photos: List[Photo]) -> List[Dict]:
+        result = scorer.score_paths([p.path for p in photos], photo_ids=[p.photo_id for p in photos])
+        return [{'memory_score': v} for v in result['memory_score'].tolist()]
+    return Extractor('memory_score', version, ('memory_score',), score, batch=True)
+
+
+def object_counts_extractor(model, version: str = 'yolo11n-1', batch_size: int = 32) -> Extractor:
+    """
+    把 YOLO 检测（object_counts.detect_paths）包装成批量抽取器，输出 person_variables 的人物变量
+    和旧 person_result.xlsx 格式的 objects_content；检测失败的图片记为失败而不是全 0 计数
+
+    参数:
+    -------
+    model : ultralytics.YOLO
+        已加载的模型；换权重时同时修改 version
+    """
+    from object_counts import detect_paths, objects_content, person_variables
+
+    def detect(photos: List[Photo]) -> List[Optional[Dict]]:
+        counts, failed = detect_paths([p.path for p in photos], model=model, batch_size=batch_size,
+                                      photo_ids=[p.photo_id for p in photos], verbose=False)
+        table = person_variables(counts)
+        table['objects_content'] = objects_content(counts)
+        failed = set(failed)
+        return [None if pid in failed else row
+                for pid, row in zip(counts.photo_ids, table.drop(columns='photo_id').to_dict('records'))]
+    return Extractor('objects', version,
+                     ('person_count', 'person_exist', 'person_total_count', 'var', 'objects_content'),
+                     detect, batch=True)
+
+
+def aesthetic_extractor(clip_model, preprocess, head, version: str = 'sac+logos+ava1-l14-linear-1',
+                        device: str = 'cpu') -> Extractor:
+    """
+    CLIP ViT-L/14 图片编码 + 美学头（如 aesthetic_head.LinearAestheticHead）的 beauty_score 批量抽取器，
+    编码与归一化方式同 simple_inference.py
+
+    参数:
+    -------
+    clip_model, preprocess :
+        clip.load("ViT-L/14") 的返回值
+    head : callable
+        (N, 768) 归一化 embedding -> (N,) 分数；换 checkpoint 时同时修改 version
+    """
+    import torch
+    from PIL import Image
+
+    def score(photos: List[Photo]) -> List[Optional[Dict]]:
+        images, rows = [], []
+        for photo in photos:
+            try:
+                images.append(preprocess(Image.open(photo.path)))
+                rows.append(photo)
+            except Exception:
+                pass
+        out: Dict[str, Dict] = {}
+        if images:
+            with torch.no_grad():
+                embeddings = clip_model.encode_image(torch.stack(images).to(device)).float().cpu().numpy()
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.where(norms == 0, 1, norms)
+            out = {p.photo_id: {'beauty_score': float(v)} for p, v in zip(rows, head(embeddings))}
+        return [out.get(p.photo_id) for p in photos]
+    return Extractor('beauty_score', version, ('beauty_score',), score, batch=True)
+
+
+def _run_extractor(extractor: Extractor, photos: List[Photo]) -> List[Optional[Dict]]:
+    """
+    对一批图片运行抽取器，失败的图片对应 None
+
+    单张模式逐张捕获异常；批量模式整批出错（或返回的条数不对）时退回逐张调用，
+    只有本身出错的图片记为失败，不影响同批的其他图片
+    """
+    if extractor.batch:
+        try:
+            results = list(extractor.fn(photos))
+            if len(results) == len(photos):
+                return results
+        except Exception:
+            pass
+        if len(photos) == 1:
+            return [None]
+        return [value for photo in photos for value in _run_extractor(extractor, [photo])]
+    results = []
+    for photo in photos:
+        try:
+            results.append(extractor.fn(photo))
+        except Exception:
+            results.append(None)
+    return results
+
+
+def _to_builtin(value):
+    """json 序列化 numpy 标量"""
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"cannot serialise {type(value)}")
+
+
+class FeatureCache:
+    """
+    SQLite 特征缓存
+
+    每条记录的键为 (photo_id, extractor)，同时保存文件内容哈希和抽取器版本；
+    内容哈希或版本不一致即视为过期。改动一个抽取器只会重算该抽取器的结果。
+
+    参数:
+    -------
+    db_path : str
+        缓存数据库路径
+    max_bytes : int, optional
+        缓存中特征值的总大小上限，超过后按最近访问时间（LRU）淘汰
+    """
+
+    def __init__(self, db_path: str = './data/cache/features.sqlite', max_bytes: Optional[int] = None):
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS features (
+                photo_id TEXT NOT NULL,
+                extractor TEXT NOT NULL,
+                version TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (photo_id, extractor)
+            );
+            CREATE INDEX IF NOT EXISTS idx_features_access ON features (last_access);
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                mtime REAL NOT NULL,
+                size INTEGER NOT NULL,
+                content_hash TEXT NOT NULL
+            );
+        """)
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def content_hash(self, path: str) -> str:
+        """文件内容哈希（blake2b）；按 (path, mtime, size) 记忆，未改动的文件不重复读取"""
+        stat = os.stat(path)
+        row = self.conn.execute("SELECT mtime, size, content_hash FROM files WHERE path=?", (path,)).fetchone()
+        if row is not None and row[0] == stat.st_mtime and row[1] == stat.st_size:
+            return row[2]
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        content_hash = digest.hexdigest()
+        self.conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                          (path, stat.st_mtime, stat.st_size, content_hash))
+        return content_hash
+
+    def _load(self, extractor: Extractor) -> Dict[str, tuple]:
+        rows = self.conn.execute("SELECT photo_id, version, content_hash, value FROM features WHERE extractor=?",
+                                 (extractor.name,))
+        return {photo_id: (version, content_hash, value) for photo_id, version, content_hash, value in rows}
+
+    def compute(self,
+                photo_ids: Sequence[str],
+                pic_dir: str = './data/pic',
+                extractors: Sequence[Extractor] = DEFAULT_EXTRACTORS,
+                batch_size: int = 256,
+                retry_failed: bool = False,
+                verbose: bool = True) -> pd.DataFrame:
+        """
+        取出所有图片的特征，只计算缺失或过期的条目
+
+        抽取器对某张图片出错时在缓存中记一个失败标记（FAILED），同一文件内容、同一版本不再重算；
+        文件内容或抽取器版本变化后标记随之失效
+
+        参数:
+        -------
+        photo_ids : list
+            图片 id，图片路径为 pic_dir/photo_id.jpg
+        extractors : list of Extractor
+            需要的抽取器
+        batch_size : int
+            每次提交到数据库（以及批量抽取器每次处理）的图片数
+        retry_failed : bool
+            是否重算带失败标记的条目（如失败原因是显存不足等临时问题）
+
+        返回:
+        -------
+        result : pd.DataFrame
+            photo_id 加上各抽取器 fields 中的列；读不出来或抽取失败的图片对应列为空
+        """
+        photo_ids = [str(pid) for pid in photo_ids]
+        paths = {pid: os.path.join(pic_dir, pid + '.jpg') for pid in photo_ids}
+        hashes = {}
+        for pid in photo_ids:
+            try:
+                hashes[pid] = self.content_hash(paths[pid])
+            except OSError:
+                hashes[pid] = None
+        self.conn.commit()
+
+        # 先确定每个抽取器需要重算哪些图片，命中的直接取缓存值
+        now = time.time()
+        values: Dict[str, Dict[str, Dict]] = {e.name: {} for e in extractors}
+        todo: Dict[str, set] = {e.name: set() for e in extractors}
+        stats = {e.name: [0, 0, 0] for e in extractors}  # [cached, failed, cached failures]
+        for extractor in extractors:
+            cached = self._load(extractor)
+            hits = []
+            for pid in photo_ids:
+                if hashes[pid] is None:
+                    continue
+                entry = cached.get(pid)
+                if entry is not None and entry[0] == extractor.version and entry[1] == hashes[pid]:
+                    value = json.loads(entry[2])
+                    if value is FAILED:
+                        if retry_failed:
+                            todo[extractor.name].add(pid)
+                            continue
+                        stats[extractor.name][2] += 1
+                    else:
+                        values[extractor.name][pid] = value
+                    hits.append((now, pid, extractor.name))
+                else:
+                    todo[extractor.name].add(pid)
+            stats[extractor.name][0] = len(hits)
+            self.conn.executemany("UPDATE features SET last_access=? WHERE photo_id=? AND extractor=?", hits)
+        self.conn.commit()
+
+        # 按批处理图片：同一批内各抽取器共用一次解码，批处理完即释放
+        pending = [pid for pid in photo_ids if any(pid in t for t in todo.values())]
+        for start in range(0, len(pending), batch_size):
+            photos = [Photo(pid, paths[pid]) for pid in pending[start:start + batch_size]]
+            rows = []
+            for extractor in extractors:
+                targets = [p for p in photos if p.photo_id in todo[extractor.name]]
+                if not targets:
+                    continue
+                for photo, value in zip(targets, _run_extractor(extractor, targets)):
+                    if value is None:
+                        stats[extractor.name][1] += 1
+                        value = FAILED
+                    else:
+                        values[extractor.name][photo.photo_id] = value
+                    text = json.dumps(value, default=_to_builtin)
+                    rows.append((photo.photo_id, extractor.name, extractor.version, hashes[photo.photo_id],
+                                 text, len(text), now))
+            self.conn.executemany("INSERT OR REPLACE INTO features VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self.conn.commit()
+
+        if verbose:
+            for extractor in extractors:
+                n_cached, n_failed, n_cached_failed = stats[extractor.name]
+                print(f"{extractor.name} (v{extractor.version}): {n_cached} cached "
+                      f"({n_cached_failed} marked failed), {len(todo[extractor.name]) - n_failed} computed, "
+                      f"{n_failed} failed")
+        if self.max_bytes is not None:
+            self.evict(self.max_bytes)
+
+        result = pd.DataFrame({'photo_id': photo_ids})
+        for extractor in extractors:
+            mapping = values[extractor.name]
+            for col in extractor.fields:
+                result[col] = result['photo_id'].map({pid: v.get(col) for pid, v in mapping.items()})
+        return result
+
+    def total_bytes(self) -> int:
+        return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM features").fetchone()[0]
+
+    def evict(self, max_bytes: int) -> int:
+        """按最近访问时间淘汰条目，直到总大小不超过 max_bytes，返回删除条数"""
+        total = self.total_bytes()
+        if total <= max_bytes:
+            return 0
+        to_free = total - max_bytes
+        victims, freed = [], 0
+        for photo_id, extractor, size in self.conn.execute(
+                "SELECT photo_id, extractor, size FROM features ORDER BY last_access"):
+            if freed >= to_free:
+                break
+            victims.append((photo_id, extractor))
+            freed += size
+        self.conn.executemany("DELETE FROM features WHERE photo_id=? AND extractor=?", victims)
+        self.conn.commit()
+        return len(victims)
+
+    def prune(self, extractors: Sequence[Extractor] = DEFAULT_EXTRACTORS) -> int:
+        """删除版本号与当前抽取器不一致的旧条目，返回删除条数"""
+        deleted = 0
+        for extractor in extractors:
+            cur = self.conn.execute("DELETE FROM features WHERE extractor=? AND version<>?",
+                                    (extractor.name, extractor.version))
+            deleted += cur.rowcount
+        self.conn.commit()
+        return deleted
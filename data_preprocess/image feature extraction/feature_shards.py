@@ -0,0 +1,171 @@
+# feature_shards.py - 可断点续跑的特征抽取：定长 Parquet 分片 + manifest
+
+import json
+import os
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Set
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+
+class ShardWriter:
+    """
+    只追加的 Parquet 分片写入器
+
+    每攒够 shard_size 条结果写一个分片：先写临时文件再 os.replace 改名，
+    然后原子地更新 manifest.json。只有登记在 manifest 中的分片才算提交成功，
+    进程中途崩溃最多丢失当前未写满的一个分片。
+
+    参数:
+    -------
+    out_dir : str
+        分片目录
+    shard_size : int
+        每个分片的行数
+    key : str
+        主键列名
+    """
+
+    MANIFEST = 'manifest.json'
+
+    def __init__(self, out_dir: str = './data/shards/photos_detail', shard_size: int = 5000, key: str = 'photo_id'):
+        self.out_dir = out_dir
+        self.shard_size = shard_size
+        self.key = key
+        self.buffer: List[Dict] = []
+        os.makedirs(out_dir, exist_ok=True)
+        self.manifest = self._read_manifest()
+        self._remove_orphans()
+
+    def _read_manifest(self) -> Dict:
+        path = os.path.join(self.out_dir, self.MANIFEST)
+        if not os.path.exists(path):
+            return {'key': self.key, 'shards': []}
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_manifest(self) -> None:
+        path = os.path.join(self.out_dir, self.MANIFEST)
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def _remove_orphans(self) -> None:
+        """删除崩溃时留下的临时文件和未登记的分片"""
+        committed = {s['file'] for s in self.manifest['shards']}
+        for name in os.listdir(self.out_dir):
+            if name.endswith('.tmp') or (name.endswith('.parquet') and name not in committed):
+                os.remove(os.path.join(self.out_dir, name))
+
+    def done_ids(self, only_ok: bool = False) -> Set[str]:
+        """已提交分片中的主键（只读主键和 ok 两列）；only_ok=True 时不含失败记录"""
+        done = set()
+        for shard in self.manifest['shards']:
+            path = os.path.join(self.out_dir, shard['file'])
+            columns = [self.key]
+            if only_ok and 'ok' in pq.read_schema(path).names:
+                columns.append('ok')
+            table = pq.read_table(path, columns=columns)
+            keys = table.column(self.key).to_pylist()
+            if 'ok' in columns:
+                keys = [k for k, ok in zip(keys, table.column('ok').to_pylist()) if ok]
+            done.update(keys)
+        return done
+
+    def append(self, record: Dict) -> None:
+        self.buffer.append(record)
+        if len(self.buffer) >= self.shard_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """把缓冲区写成一个分片并登记到 manifest"""
+        if not self.buffer:
+            return
+        name = f"shard-{len(self.manifest['shards']):05d}.parquet"
+        path = os.path.join(self.out_dir, name)
+        tmp = path + '.tmp'
+        pd.DataFrame(self.buffer).to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+        self.manifest['shards'].append({'file': name, 'rows': len(self.buffer), 'created': time.time()})
+        self._write_manifest()
+        self.buffer = []
+
+    def compact(self, output_path: Optional[str] = None) -> pd.DataFrame:
+        """
+        合并所有已提交分片为一张表（同一主键以最后写入的为准）
+
+        参数:
+        -------
+        output_path : str, optional
+            合并结果的保存路径，.parquet 或 .xlsx
+        """
+        self.flush()
+        frames = [pd.read_parquet(os.path.join(self.out_dir, s['file'])) for s in self.manifest['shards']]
+        if not frames:
+            return pd.DataFrame(columns=[self.key])
+        merged = pd.concat(frames, ignore_index=True).drop_duplicates(self.key, keep='last').reset_index(drop=True)
+        if output_path:
+            if output_path.endswith('.xlsx'):
+                merged.to_excel(output_path, index=False)
+            else:
+                merged.to_parquet(output_path, index=False)
+        return merged
+
+
+def run_resumable(keys: Sequence[str],
+                  extract_fn: Callable[[str], Dict],
+                  writer: ShardWriter,
+                  log_path: Optional[str] = None,
+                  retry_failed: bool = False,
+                  verbose: bool = True) -> Dict[str, int]:
+    """
+    逐条抽取特征并写入分片；重启后跳过已提交分片中的 key
+
+    参数:
+    -------
+    keys : list
+        待处理的主键（如 photo_id）
+    extract_fn : callable
+        extract_fn(key) -> dict，抛异常视为失败，写入一条只有主键和 ok=False 的记录
+    writer : ShardWriter
+        分片写入器
+    log_path : str, optional
+        失败记录日志（与原 pic.log 一样每行一个 key）
+    retry_failed : bool
+        是否重新处理之前失败的 key（compact 时以最后一次结果为准）
+
+    返回:
+    -------
+    stats : dict
+        skipped / done / failed 计数
+    """
+    done = writer.done_ids(only_ok=retry_failed)
+    todo = [k for k in keys if k not in done]
+    stats = {'skipped': len(keys) - len(todo), 'done': 0, 'failed': 0}
+    if verbose:
+        print(f"{stats['skipped']} already in committed shards, {len(todo)} to process")
+    log = open(log_path, 'a', encoding='utf-8') if log_path else None
+    try:
+        for count, key in enumerate(todo, 1):
+            try:
+                record = {writer.key: key}
+                record.update(extract_fn(key))
+                record['ok'] = True
+                stats['done'] += 1
+            except Exception:
+                record = {writer.key: key, 'ok': False}
+                stats['failed'] += 1
+                if log:
+                    print(key, file=log)
+            writer.append(record)
+            if verbose and count % writer.shard_size == 0:
+                print(f"{count}/{len(todo)} processed, {stats['failed']} failed")
+        writer.flush()
+    finally:
+        if log:
+            log.close()
+    return stats
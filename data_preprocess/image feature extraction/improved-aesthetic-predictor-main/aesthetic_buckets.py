@@ -0,0 +1,112 @@
+# Streaming version of visulaize_100k_from_LAION400M.py for local WebDataset tar shards.
+#
+# Samples are decoded and preprocessed in DataLoader workers, encoded with CLIP in batches and scored with the
+# aesthetic head. Instead of keeping every prediction in a Python list and scanning a DataFrame once per bucket,
+# each batch updates a fixed-size bucket histogram and a bounded reservoir sample of urls per bucket, so memory
+# stays constant no matter how many shards are pushed through.
+
+import glob
+import random
+
+import numpy as np
+import torch
+import webdataset as wds
+from torch.utils.data import DataLoader
+
+from aesthetic_head import LinearAestheticHead, is_linear_checkpoint
+
+
+def normalized(a, axis=-1, order=2):
+    l2 = np.atleast_1d(np.linalg.norm(a, order, axis))
+    l2[l2 == 0] = 1
+    return a / np.expand_dims(l2, axis)
+
+
+class BucketHistogram:
+    """Counts of scores in n_buckets buckets of the given width starting at 0, plus up to
+    reservoir_size urls per bucket chosen uniformly at random (reservoir sampling)."""
+
+    def __init__(self, n_buckets=20, width=0.5, reservoir_size=50, seed=0):
+        self.n_buckets = n_buckets
+        self.width = width
+        self.reservoir_size = reservoir_size
+        self.counts = np.zeros(n_buckets, dtype=np.int64)
+        self.total = 0
+        self.reservoirs = [[] for _ in range(n_buckets)]
+        self.rng = random.Random(seed)
+
+    def update(self, scores, urls):
+        scores = np.asarray(scores, dtype=np.float64)
+        self.total += len(scores)
+        buckets = np.floor(scores / self.width).astype(np.int64)
+        # a score exactly on the upper edge belongs to the last bucket, like the closed [a, b] ranges of the original
+        buckets[scores == self.n_buckets * self.width] = self.n_buckets - 1
+        for bucket, url in zip(buckets, urls):
+            if bucket < 0 or bucket >= self.n_buckets:
+                continue
+            self.counts[bucket] += 1
+            reservoir = self.reservoirs[bucket]
+            if len(reservoir) < self.reservoir_size:
+                reservoir.append(url)
+            else:
+                j = self.rng.randrange(self.counts[bucket])
+                if j < self.reservoir_size:
+                    reservoir[j] = url
+
+    def to_html(self, title="Aesthetic subsets in LAION 100k samples"):
+        html = "<h1>" + title + "</h1>"
+        for i in range(self.n_buckets):
+            a = i * self.width
+            b = (i + 1) * self.width
+            count_part = self.counts[i] / max(self.total, 1) * 100
+            estimated = int(self.counts[i])
+            html += f"<h2>In bucket {a} - {b} there is {count_part:.2f}% samples:{estimated:.2f} </h2> <div>"
+            for filepath in self.reservoirs[i]:
+                html += '<img src="' + filepath + '" height="200" />'
+            html += "</div>"
+        return html
+
+
+def shard_loader(shards, preprocess, batch_size=64, num_workers=4):
+    """Yields (image batch tensor, list of urls); broken samples are skipped with a warning."""
+    dataset = (
+        wds.WebDataset(shards, handler=wds.warn_and_continue, shardshuffle=False)
+        .decode("pil", handler=wds.warn_and_continue)
+        .to_tuple("jpg", "json", handler=wds.warn_and_continue)
+        .map_tuple(preprocess, lambda metadata: metadata["url"], handler=wds.warn_and_continue)
+        .batched(batch_size, partial=True)
+    )
+    return DataLoader(dataset, batch_size=None, num_workers=num_workers)
+
+
+def score_shards(shards, clip_model, preprocess, head, histogram, device="cpu", batch_size=64, num_workers=4):
+    seen = 0
+    for images, urls in shard_loader(shards, preprocess, batch_size, num_workers):
+        with torch.no_grad():
+            image_features = clip_model.encode_image(images.to(device))
+        scores = head(normalized(image_features.float().cpu().numpy()))
+        histogram.update(scores, urls)
+        seen += len(urls)
+        print(seen, "samples scored")
+    return histogram
+
+
+if __name__ == "__main__":
+    import sys
+
+    import clip
+
+    # python aesthetic_buckets.py "/data/laion400m/*.tar" ava+logos-l14-linearMSE.pth
+    shards = sorted(glob.glob(sys.argv[1] if len(sys.argv) > 1 else "./shards/*.tar"))
+    checkpoint = sys.argv[2] if len(sys.argv) > 2 else "ava+logos-l14-linearMSE.pth"
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    s = torch.load(checkpoint, map_location="cpu")
+    if not is_linear_checkpoint(s):
+        raise SystemExit("streaming mode expects a linear checkpoint such as ava+logos-l14-linearMSE.pth")
+    head = LinearAestheticHead.from_state_dict(s)
+    model2, preprocess = clip.load("ViT-L/14", device=device)
+
+    histogram = score_shards(shards, model2, preprocess, head, BucketHistogram(), device=device)
+    with open("./aesthetic_viz_laion_ava+logos_L14_100k-linearMSE.html", "w") as f:
+        f.write(histogram.to_html())
@@ -0,0 +1,98 @@
+# The MLP used by simple_inference.py / train_predictor.py has all of its nn.ReLU layers commented out.
+# In eval mode (dropout off) its five nn.Linear layers therefore compose into a single 768 -> 1 affine map.
+# This module folds such a checkpoint into one weight vector + bias, so scoring a batch of CLIP embeddings
+# is one matrix-vector product that runs on CPU without torch.
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+# indices of the nn.Linear layers inside MLP.layers when every ReLU is commented out:
+# 0 Linear, 1 Dropout, 2 Linear, 3 Dropout, 4 Linear, 5 Dropout, 6 Linear, 7 Linear
+LINEAR_LAYOUT = (0, 2, 4, 6, 7)
+
+
+def linear_layer_indices(state_dict):
+    return sorted({int(k.split(".")[1]) for k in state_dict if k.startswith("layers.") and k.endswith(".weight")})
+
+
+def is_linear_checkpoint(state_dict):
+    """True for checkpoints like sac+logos+ava1-l14-linearMSE.pth (no activations between the layers)."""
+    return tuple(linear_layer_indices(state_dict)) == LINEAR_LAYOUT
+
+
+class LinearAestheticHead:
+    def __init__(self, weight, bias):
+        self.weight = np.asarray(weight, dtype=np.float32).reshape(-1)
+        self.bias = float(bias)
+
+    @classmethod
+    def from_state_dict(cls, state_dict):
+        if not is_linear_checkpoint(state_dict):
+            raise ValueError("checkpoint is not purely linear (layer indices %s), load it with the matching MLP class"
+                             % linear_layer_indices(state_dict))
+        # fold y = W_k(...(W_1 x + b_1)...) + b_k in float64: W = W_k...W_1, b = W_k...W_2 b_1 + ... + b_k
+        weight = None
+        bias = None
+        for i in LINEAR_LAYOUT:
+            w = state_dict["layers.%d.weight" % i].detach().cpu().double().numpy()
+            b = state_dict["layers.%d.bias" % i].detach().cpu().double().numpy()
+            weight = w if weight is None else w @ weight
+            bias = b if bias is None else w @ bias + b
+        return cls(weight[0], bias[0])
+
+    @classmethod
+    def load(cls, path):
+        return cls.from_state_dict(torch.load(path, map_location="cpu"))
+
+    def __call__(self, embeddings):
+        """embeddings: (N, 768) normalised CLIP embeddings (numpy, float16/32, may be a memmap) -> (N,) scores."""
+        embeddings = np.asarray(embeddings)
+        if embeddings.dtype != np.float32:
+            embeddings = embeddings.astype(np.float32)
+        return embeddings @ self.weight + self.bias
+
+    def score_in_chunks(self, embeddings, chunk_size=65536):
+        """Score a large (e.g. memory-mapped) matrix without materialising it as float32 all at once."""
+        out = np.empty(len(embeddings), dtype=np.float32)
+        for start in range(0, len(embeddings), chunk_size):
+            out[start:start + chunk_size] = self(embeddings[start:start + chunk_size])
+        return out
+
+
+def layered_model(state_dict):
+    # same layer stack as MLP.layers (ReLUs commented out), without the pytorch_lightning wrapper
+    layers = nn.Sequential(
+        nn.Linear(768, 1024),
+        nn.Dropout(0.2),
+        nn.Linear(1024, 128),
+        nn.Dropout(0.2),
+        nn.Linear(128, 64),
+        nn.Dropout(0.1),
+        nn.Linear(64, 16),
+        nn.Linear(16, 1)
+    )
+    layers.load_state_dict({k[len("layers."):]: v for k, v in state_dict.items()})
+    return layers.eval()
+
+
+def check_folding(path, n=4096, atol=1e-5):
+    """Compare the folded head against the layered model on random normalised embeddings. Returns the max abs diff."""
+    state_dict = torch.load(path, map_location="cpu")
+    head = LinearAestheticHead.from_state_dict(state_dict)
+    x = np.random.default_rng(0).normal(size=(n, 768)).astype(np.float32)
+    x /= np.linalg.norm(x, axis=1, keepdims=True)
+    with torch.no_grad():
+        reference = layered_model(state_dict)(torch.from_numpy(x)).numpy()[:, 0]
+    diff = float(np.max(np.abs(head(x) - reference)))
+    print("%s: max |folded - layered| = %.3g (%s)" % (path, diff, "OK" if diff <= atol else "MISMATCH"))
+    return diff
+
+
+if __name__ == "__main__":
+    import sys
+
+    # python aesthetic_head.py sac+logos+ava1-l14-linearMSE.pth ava+logos-l14-linearMSE.pth
+    paths = sys.argv[1:] or ["sac+logos+ava1-l14-linearMSE.pth", "ava+logos-l14-linearMSE.pth"]
+    failed = [p for p in paths if check_folding(p) > 1e-5]
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,144 @@
+# This module keeps normalised CLIP ViT-L/14 image embeddings on disk so that the image encoder only has to run once per photo.
+# Re-scoring with a new aesthetic head is then a matrix product over the memory-mapped embedding matrix.
+#
+# Layout of a store directory:
+#   embeddings.npy  - (capacity, dim) float16/float32 matrix, opened with np.load(mmap_mode=...)
+#   ids.txt         - one photo_id per line; line i is row i. It is appended after the rows are flushed,
+#                     so after a crash the number of lines is always the number of valid rows.
+#   meta.json       - dim and dtype
+
+import json
+import os
+
+import numpy as np
+import torch
+from PIL import Image
+
+
+def normalized(a, axis=-1, order=2):
+    l2 = np.atleast_1d(np.linalg.norm(a, order, axis))
+    l2[l2 == 0] = 1
+    return a / np.expand_dims(l2, axis)
+
+
+class EmbeddingStore:
+    def __init__(self, root, dim=768, dtype="float16", initial_capacity=4096):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        meta_path = os.path.join(root, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            self.dim, self.dtype = meta["dim"], np.dtype(meta["dtype"])
+        else:
+            self.dim, self.dtype = dim, np.dtype(dtype)
+            with open(meta_path, "w") as f:
+                json.dump({"dim": self.dim, "dtype": self.dtype.name}, f)
+
+        self.ids = []
+        ids_path = os.path.join(root, "ids.txt")
+        if os.path.exists(ids_path):
+            with open(ids_path, encoding="utf-8") as f:
+                self.ids = [line.rstrip("\n") for line in f if line.strip()]
+        self.index = {photo_id: row for row, photo_id in enumerate(self.ids)}
+
+        if not os.path.exists(self._npy_path):
+            np.lib.format.open_memmap(self._npy_path, mode="w+", dtype=self.dtype,
+                                      shape=(max(initial_capacity, len(self.ids)), self.dim)).flush()
+        self._data = np.load(self._npy_path, mmap_mode="r+")
+
+    @property
+    def _npy_path(self):
+        return os.path.join(self.root, "embeddings.npy")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, photo_id):
+        return photo_id in self.index
+
+    @property
+    def matrix(self):
+        # zero-copy read-only view of all valid rows
+        view = self._data[:len(self.ids)]
+        view.flags.writeable = False
+        return view
+
+    def get(self, photo_ids):
+        rows = [self.index[p] for p in photo_ids]
+        return np.asarray(self._data[rows])
+
+    def missing(self, photo_ids):
+        return [p for p in photo_ids if p not in self.index]
+
+    def _grow(self, needed):
+        capacity = self._data.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2)
+        tmp_path = self._npy_path + ".tmp"
+        grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=self.dtype, shape=(new_capacity, self.dim))
+        grown[:len(self.ids)] = self._data[:len(self.ids)]
+        grown.flush()
+        del grown
+        del self._data
+        os.replace(tmp_path, self._npy_path)
+        self._data = np.load(self._npy_path, mmap_mode="r+")
+
+    def append(self, photo_ids, embeddings):
+        """Append new rows. Embeddings are L2-normalised here, exactly like the training/inference scripts do.
+        Ids already in the store are skipped; an id repeated within one call is stored once, from its last occurrence."""
+        embeddings = normalized(np.asarray(embeddings, dtype=np.float32))
+        last = {p: i for i, p in enumerate(photo_ids) if p not in self.index}
+        new = sorted(last.values())
+        if not new:
+            return
+        start = len(self.ids)
+        self._grow(start + len(new))
+        self._data[start:start + len(new)] = embeddings[new].astype(self.dtype)
+        self._data.flush()
+        with open(os.path.join(self.root, "ids.txt"), "a", encoding="utf-8") as f:
+            for i in new:
+                f.write(photo_ids[i] + "\n")
+        for offset, i in enumerate(new):
+            self.ids.append(photo_ids[i])
+            self.index[photo_ids[i]] = start + offset
+
+    def encode_paths(self, paths, photo_ids, clip_model, preprocess, device="cpu", batch_size=64):
+        """Run the CLIP image encoder only for photos that are not in the store yet. Returns the ids that failed to load."""
+        todo = [(path, photo_id) for path, photo_id in zip(paths, photo_ids) if photo_id not in self.index]
+        failed = []
+        for start in range(0, len(todo), batch_size):
+            images, ids = [], []
+            for path, photo_id in todo[start:start + batch_size]:
+                try:
+                    images.append(preprocess(Image.open(path)))
+                    ids.append(photo_id)
+                except Exception:
+                    failed.append(photo_id)
+            if not images:
+                continue
+            with torch.no_grad():
+                image_features = clip_model.encode_image(torch.stack(images).to(device))
+            self.append(ids, image_features.float().cpu().numpy())
+            print(len(self), "embeddings stored")
+        return failed
+
+
+if __name__ == "__main__":
+    import sys
+
+    import clip
+
+    # python embedding_store.py /root/pic ./clip_l14_store
+    pic_dir = sys.argv[1] if len(sys.argv) > 1 else "/root/pic"
+    store_dir = sys.argv[2] if len(sys.argv) > 2 else "./clip_l14_store"
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    model2, preprocess = clip.load("ViT-L/14", device=device)
+    store = EmbeddingStore(store_dir)
+    files = sorted(os.listdir(pic_dir))
+    failed = store.encode_paths([os.path.join(pic_dir, f) for f in files],
+                                [os.path.splitext(f)[0] for f in files],
+                                model2, preprocess, device=device)
+    print(len(store), "embeddings in store,", len(failed), "images failed")
@@ -0,0 +1,140 @@
+# Closed-form alternative to the Adam loop in train_predictor.py.
+#
+# The MLP there has every nn.ReLU commented out, so it is a linear regression on the CLIP embedding. This script
+# accumulates X'X and X'y for the training rows in one streaming pass over the memory-mapped embedding file,
+# eigendecomposes the centred Gram matrix once and then solves the ridge system for every regularisation strength
+# on the grid at the cost of a matrix product. The strength with the best validation MSE (or MAE) is written as a
+# state dict that the MLP class in train_predictor.py / simple_inference.py loads unchanged.
+
+import numpy as np
+import torch
+
+from aesthetic_head import LINEAR_LAYOUT, LinearAestheticHead, layered_model
+
+# shapes of MLP.layers: index -> (out_features, in_features)
+MLP_SHAPES = {0: (1024, 768), 2: (128, 1024), 4: (64, 128), 6: (16, 64), 7: (1, 16)}
+
+
+def train_val_split(n_samples, val_percentage=0.05, seed=42):
+    # same seeded permutation as train_predictor.py
+    permutation = np.random.default_rng(seed).permutation(n_samples)
+    train_border = int(n_samples * (1 - val_percentage))
+    return np.sort(permutation[:train_border]), np.sort(permutation[train_border:])
+
+
+def accumulate_gram(x, y, rows, chunk_size=65536):
+    """One pass over the given rows of the (memory-mapped) x / y. Returns n, sum x, sum y, X'X, X'y in float64."""
+    dim = x.shape[1]
+    xtx = np.zeros((dim, dim))
+    xty = np.zeros(dim)
+    x_sum = np.zeros(dim)
+    y_sum = 0.0
+    for start in range(0, len(rows), chunk_size):
+        idx = rows[start:start + chunk_size]
+        xb = np.asarray(x[idx], dtype=np.float64)
+        yb = np.asarray(y[idx], dtype=np.float64).reshape(-1)
+        xtx += xb.T @ xb
+        xty += xb.T @ yb
+        x_sum += xb.sum(axis=0)
+        y_sum += yb.sum()
+    return len(rows), x_sum, y_sum, xtx, xty
+
+
+def ridge_path(n, x_sum, y_sum, xtx, xty, alphas):
+    """Ridge solutions with an unpenalised intercept for every alpha, from a single eigendecomposition.
+
+    alphas are per-sample penalties: w = (C/n + alpha I)^-1 c/n with C, c the centred X'X, X'y.
+    The covariance is only positive semi-definite (singular when there are fewer rows than dimensions), so its
+    eigenvalues are clipped at 0 and every alpha is floored at 1e-10 times the mean eigenvalue; alpha=0 therefore
+    gives the minimum-norm least squares solution instead of dividing by ~0.
+    Returns weights (len(alphas), dim) and biases (len(alphas),)."""
+    x_mean = x_sum / n
+    y_mean = y_sum / n
+    cov = xtx / n - np.outer(x_mean, x_mean)
+    cross = xty / n - x_mean * y_mean
+    eigenvalues, eigenvectors = np.linalg.eigh(cov)
+    eigenvalues = np.clip(eigenvalues, 0.0, None)
+    projected = eigenvectors.T @ cross
+    alphas = np.maximum(np.asarray(alphas, dtype=np.float64), 1e-10 * eigenvalues.mean())
+    shrink = eigenvalues[None, :] + alphas[:, None]
+    # directions with (numerically) zero variance carry no signal; leave them out rather than amplifying noise
+    shrink[:, eigenvalues <= 1e-12 * eigenvalues.max()] = np.inf
+    weights = (projected / shrink) @ eigenvectors.T
+    biases = y_mean - weights @ x_mean
+    return weights, biases
+
+
+def validation_losses(x, y, rows, weights, biases, chunk_size=65536):
+    """MSE and MAE on the given rows for every candidate (weights, bias) pair."""
+    squared = np.zeros(len(biases))
+    absolute = np.zeros(len(biases))
+    for start in range(0, len(rows), chunk_size):
+        idx = rows[start:start + chunk_size]
+        xb = np.asarray(x[idx], dtype=np.float64)
+        yb = np.asarray(y[idx], dtype=np.float64).reshape(-1, 1)
+        residual = xb @ weights.T + biases[None, :] - yb
+        squared += (residual ** 2).sum(axis=0)
+        absolute += np.abs(residual).sum(axis=0)
+    return squared / len(rows), absolute / len(rows)
+
+
+def linear_state_dict(weight, bias):
+    """State dict for MLP.layers that computes weight . x + bias exactly.
+
+    The first layer carries the weights in its first unit; the following layers pass that unit through."""
+    state_dict = {}
+    for i in LINEAR_LAYOUT:
+        out_features, in_features = MLP_SHAPES[i]
+        w = torch.zeros(out_features, in_features)
+        b = torch.zeros(out_features)
+        if i == LINEAR_LAYOUT[0]:
+            w[0] = torch.as_tensor(np.asarray(weight, dtype=np.float32))
+        else:
+            w[0, 0] = 1.0
+        if i == LINEAR_LAYOUT[-1]:
+            b[0] = float(bias)
+        state_dict["layers.%d.weight" % i] = w
+        state_dict["layers.%d.bias" % i] = b
+    return state_dict
+
+
+def fit_linear_head(x_path, y_path, alphas=None, val_percentage=0.05, seed=42, select="mse", chunk_size=65536):
+    """Fit the ridge grid on the training split and return (state_dict, alpha, mse, mae) of the best candidate."""
+    if alphas is None:
+        alphas = np.logspace(-7, -1, 13)
+    x = np.load(x_path, mmap_mode="r")
+    y = np.load(y_path, mmap_mode="r")
+    train_rows, val_rows = train_val_split(x.shape[0], val_percentage, seed)
+
+    weights, biases = ridge_path(*accumulate_gram(x, y, train_rows, chunk_size), alphas)
+    mse, mae = validation_losses(x, y, val_rows, weights, biases, chunk_size)
+    for alpha, m, a in zip(alphas, mse, mae):
+        print('Validation - alpha %g | MSE Loss %6.4f | MAE Loss %6.4f' % (alpha, m, a))
+
+    # a diverged candidate (NaN / inf loss) must never be picked
+    losses = np.where(np.isfinite(mse) & np.isfinite(mae), mse if select == "mse" else mae, np.nan)
+    best = int(np.nanargmin(losses))
+    print("Best %s Val loss with alpha %g" % (select.upper(), alphas[best]))
+    return linear_state_dict(weights[best], biases[best]), float(alphas[best]), float(mse[best]), float(mae[best])
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    # python fit_linear_head.py /mnt/spirit/ava_x.npy /mnt/spirit/ava_y.npy linear_predictor_L14_MSE.pth
+    x_path = sys.argv[1] if len(sys.argv) > 1 else "/mnt/spirit/ava_x.npy"
+    y_path = sys.argv[2] if len(sys.argv) > 2 else "/mnt/spirit/ava_y.npy"
+    save_name = sys.argv[3] if len(sys.argv) > 3 else "linear_predictor_L14_MSE.pth"
+
+    start = time.time()
+    state_dict, alpha, mse, mae = fit_linear_head(x_path, y_path)
+    torch.save(state_dict, save_name)
+    print("training done in %.1fs, saved %s" % (time.time() - start, save_name))
+
+    # sanity check: the saved layer stack and the folded head agree
+    layers = layered_model(state_dict)
+    sample = torch.from_numpy(np.array(np.load(x_path, mmap_mode="r")[:5], dtype=np.float32))
+    with torch.no_grad():
+        print(layers(sample)[:, 0])
+    print(LinearAestheticHead.from_state_dict(state_dict)(sample.numpy()))
@@ -1,17 +1,21 @@
-
 # This script prepares the training images and ratings for the training.
 # It assumes that all images are stored as files that PIL can read.
 # It also assumes that the paths to the images files and the average ratings are in a .parquet files that can be read into a dataframe ( df ).
+#
+# Images are opened and preprocessed in DataLoader worker processes and encoded with CLIP in batches.
+# Embeddings and ratings are written straight into preallocated memory-mapped .npy files, so peak memory does not
+# grow with the dataset. Images that cannot be read are logged to bad_images.txt and skipped.
+
+import os
+import time
 
-from datasets import load_dataset
 import pandas as pd
-import statistics
 from torch.utils.data import Dataset, DataLoader
 import clip
 import torch
 from PIL import Image, ImageFile
 import numpy as np
-import time
+
 
 def normalized(a, axis=-1, order=2):
     import numpy as np  # pylint: disable=import-outside-toplevel
@@ -21,56 +25,81 @@ def normalized(a, axis=-1, order=2):
     return a / np.expand_dims(l2, axis)
 
 
+class RatedImages(Dataset):
+    def __init__(self, paths, ratings, preprocess):
+        self.paths = paths
+        self.ratings = ratings
+        self.preprocess = preprocess
 
-device = "cuda" if torch.cuda.is_available() else "cpu"
-model, preprocess = clip.load("ViT-L/14", device=device)
+    def __len__(self):
+        return len(self.paths)
 
- 
-f = "trainingdata.parquet"
-df = pd.read_parquet(f)  #assumes that the df has the columns IMAGEPATH  & AVERAGE_RATING
+    def __getitem__(self, i):
+        try:
+            return self.preprocess(Image.open(self.paths[i])), self.ratings[i], i
+        except Exception:
+            return None, self.ratings[i], i
 
 
-x = []
-y = []
-c= 0
+def collate_skip_bad(samples):
+    good = [s for s in samples if s[0] is not None]
+    bad = [s[2] for s in samples if s[0] is None]
+    images = torch.stack([s[0] for s in good]) if good else None
+    ratings = np.array([s[1] for s in good], dtype=np.float64)
+    return images, ratings, bad
 
-for idx, row in df.iterrows():
-    start = time.time()
 
-    average_rating = float(row.AVERAGE_RATING)
-    print(average_rating)
-    if average_rating <1:
-       continue
+def shrink_npy(tmp_path, final_path, rows, chunk=65536):
+    # copy the filled prefix of a preallocated memmap into a file of the exact size, chunk by chunk
+    src = np.load(tmp_path, mmap_mode="r")
+    dst = np.lib.format.open_memmap(final_path, mode="w+", dtype=src.dtype, shape=(rows,) + src.shape[1:])
+    for start in range(0, rows, chunk):
+        dst[start:start + chunk] = src[start:min(start + chunk, rows)]
+    dst.flush()
+    del src, dst
+    os.remove(tmp_path)
 
-    img= row.IMAGEPATH  #assumes that the df has the column IMAGEPATH
-    print(img)
 
-    try:
-       image = preprocess(Image.open(img)).unsqueeze(0).to(device)
-    except:
-   	   continue
+if __name__ == "__main__":
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    model, preprocess = clip.load("ViT-L/14", device=device)
 
-    with torch.no_grad():
-       image_features = model.encode_image(image)
+    batch_size = 64
+    num_workers = 8
 
-    im_emb_arr = image_features.cpu().detach().numpy() 
-    x.append(normalized ( im_emb_arr) )      # all CLIP embeddings are getting normalized. This also has to be done when inputting an embedding later for inference
-    y_ = np.zeros((1, 1))
-    y_[0][0] = average_rating
-    #y_[0][1] = stdev      # I initially considered also predicting the standard deviation, but then didn't do it
+    f = "trainingdata.parquet"
+    df = pd.read_parquet(f, columns=["IMAGEPATH", "AVERAGE_RATING"])  #assumes that the df has the columns IMAGEPATH  & AVERAGE_RATING
+    df = df[df["AVERAGE_RATING"].astype(float) >= 1].reset_index(drop=True)
+    print(len(df), "images to encode")
 
-    y.append(y_)
+    dataset = RatedImages(df["IMAGEPATH"].tolist(), df["AVERAGE_RATING"].astype(float).tolist(), preprocess)
+    loader = DataLoader(dataset, batch_size=batch_size, num_workers=num_workers, collate_fn=collate_skip_bad)
 
+    x = np.lib.format.open_memmap("x_OpenAI_CLIP_L14_embeddings.npy.tmp", mode="w+", dtype=np.float32, shape=(len(df), 768))
+    y = np.lib.format.open_memmap("y_ratings.npy.tmp", mode="w+", dtype=np.float64, shape=(len(df), 1))
 
-    print(c)
-    c+=1
-
-
-
-
-x = np.vstack(x)
-y = np.vstack(y)
-print(x.shape)
-print(y.shape)
-np.save('x_OpenAI_CLIP_L14_embeddings.npy', x)
-np.save('y_ratings.npy', y)
+    c = 0
+    start = time.time()
+    with open("bad_images.txt", "w", encoding="utf-8") as bad_log:
+        for images, ratings, bad in loader:
+            for i in bad:
+                print(dataset.paths[i], file=bad_log)
+            if images is None:
+                continue
+
+            with torch.no_grad():
+                image_features = model.encode_image(images.to(device))
+
+            n = len(ratings)
+            x[c:c + n] = normalized(image_features.float().cpu().numpy())      # all CLIP embeddings are getting normalized. This also has to be done when inputting an embedding later for inference
+            y[c:c + n, 0] = ratings
+            c += n
+            print(c, "embedded,", round(c / (time.time() - start), 1), "images/sec")
+
+    x.flush()
+    y.flush()
+    del x, y
+    shrink_npy("x_OpenAI_CLIP_L14_embeddings.npy.tmp", "x_OpenAI_CLIP_L14_embeddings.npy", c)
+    shrink_npy("y_ratings.npy.tmp", "y_ratings.npy", c)
+    print((c, 768))
+    print((c, 1))
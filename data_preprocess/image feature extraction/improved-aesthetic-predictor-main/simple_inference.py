@@ -24,6 +24,8 @@ import json
 
 import clip
 
+from aesthetic_head import LinearAestheticHead, is_linear_checkpoint
+
 
 from PIL import Image, ImageFile
 
@@ -86,37 +88,67 @@ def normalized(a, axis=-1, order=2):
 
 
 
-model = MLP(768)  # CLIP embedding dim is 768 for CLIP ViT L 14
-s = torch.load("sac+logos+ava1-l14-linearMSE.pth")   # load the model you trained previously or the model available in this repo
-model.load_state_dict(s)
-model.to("cuda")
-model.eval()
 device = "cuda" if torch.cuda.is_available() else "cpu"
+
+s = torch.load("sac+logos+ava1-l14-linearMSE.pth", map_location="cpu")   # load the model you trained previously or the model available in this repo
+if is_linear_checkpoint(s):
+    # the MLP has no activations, so its 5 linear layers fold into one 768 -> 1 map: one mat-vec per batch, on CPU
+    head = LinearAestheticHead.from_state_dict(s)
+else:
+    model = MLP(768)  # CLIP embedding dim is 768 for CLIP ViT L 14
+    model.load_state_dict(s)
+    model.to(device)
+    model.eval()
+    head = lambda emb: model(torch.from_numpy(emb).float().to(device)).detach().cpu().numpy()[:, 0]
+
 model2, preprocess = clip.load("ViT-L/14", device=device)  #RN50x64   
 
 
 fs = open('result.txt','a+',encoding="utf-8")
 
+
+def encode(images):
+    with torch.no_grad():
+        image_features = model2.encode_image(torch.stack(images).to(device))
+    return normalized(image_features.cpu().detach().numpy() )
+
+
+batch_size = 32
+paths = os.listdir("/root/pic")[:]
 count = 0
-for path in os.listdir("/root/pic")[:]:
-    img_path = "/root/pic/"+path
-    # print(img_path)
+for start in range(0, len(paths), batch_size):
+    images = []
+    names = []
+    for path in paths[start:start + batch_size]:
+        img_path = "/root/pic/"+path
+        try:
+            images.append(preprocess(Image.open(img_path)))
+            names.append(path)
+        except:
+            count+=1
+            print(count,path,'')
+            print(path+"&"+'',file=fs)
+    if not images:
+        continue
     try:
-        # img_path = "t2.jpg"
-        pil_image = Image.open(img_path)
-        image = preprocess(pil_image).unsqueeze(0).to(device)
-        with torch.no_grad():
-           image_features = model2.encode_image(image)
-        im_emb_arr = normalized(image_features.cpu().detach().numpy() )
-        prediction = model(torch.from_numpy(im_emb_arr).to(device).type(torch.cuda.FloatTensor))
-        # print( "Aesthetic score predicted by the model:")
-        # print( round(prediction.item(),5))
-        count+=1
-        print(count,path,round(prediction.item(),5))
-        print(path+"&"+str(round(prediction.item(),5)),file=fs)
-    except:
+        im_emb_arr = encode(images)
+    except Exception as e:
+        # one bad image (odd size/mode) or an OOM must not kill the run: retry this batch one image at a time
+        print('batch failed, encoding one by one:', repr(e), names)
+        kept_names, embeddings = [], []
+        for path, image in zip(names, images):
+            try:
+                embeddings.append(encode([image]))
+                kept_names.append(path)
+            except Exception as e:
+                count+=1
+                print(count,path,'',repr(e))
+                print(path+"&"+'',file=fs)
+        if not embeddings:
+            continue
+        names, im_emb_arr = kept_names, np.concatenate(embeddings)
+    predictions = head(im_emb_arr)
+    for path, prediction in zip(names, predictions):
         count+=1
-        print(count,path,'')
-        print(path+"&"+'',file=fs)
-
-
+        print(count,path,round(float(prediction),5))
+        print(path+"&"+str(round(float(prediction),5)),file=fs)
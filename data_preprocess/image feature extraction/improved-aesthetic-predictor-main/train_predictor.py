@@ -8,7 +8,7 @@ from torch.utils.data import DataLoader
 import torch.nn.functional as F
 import pandas as pd
 from datasets import load_dataset
-from torch.utils.data import TensorDataset, DataLoader
+from torch.utils.data import Dataset, DataLoader, BatchSampler, RandomSampler, SequentialSampler
 
 import numpy as np
 
@@ -61,118 +61,139 @@ class MLP(pl.LightningModule):
 
 
 # load the training data 
+#
+# the embedding matrix is never loaded into RAM: both splits read shuffled index batches straight from the
+# memory-mapped .npy files, so training memory stays flat as the dataset grows
 
-x = np.load ("/mnt/spirit/ava_x.npy")
+class MemmapEmbeddings(Dataset):
+    def __init__(self, x_path, y_path, indices):
+        self.x_path = x_path
+        self.y_path = y_path
+        self.indices = np.asarray(indices)
+        self.x = None
+        self.y = None
 
-y = np.load ("/mnt/spirit/ava_y.npy")
+    def __len__(self):
+        return len(self.indices)
 
-val_percentage = 0.05 # 5% of the trainingdata will be used for validation
+    def __getitem__(self, positions):
+        # opened lazily so that every DataLoader worker maps the files itself instead of receiving a pickled copy
+        if self.x is None:
+            self.x = np.load(self.x_path, mmap_mode='r')
+            self.y = np.load(self.y_path, mmap_mode='r')
+        rows = np.sort(self.indices[positions])   # sorted rows -> mostly sequential reads from disk
+        x = torch.from_numpy(np.asarray(self.x[rows], dtype=np.float32))
+        y = torch.from_numpy(np.asarray(self.y[rows], dtype=np.float32)).reshape(-1, 1)
+        return x, y
 
-train_border = int(x.shape()[0] * (1 - val_percentage) )
 
-train_tensor_x = torch.Tensor(x[:train_border]) # transform to torch tensor
-train_tensor_y = torch.Tensor(y[:train_border])
+def batch_loader(dataset, batch_size, shuffle, num_workers):
+    sampler = RandomSampler(dataset) if shuffle else SequentialSampler(dataset)
+    return DataLoader(dataset, sampler=BatchSampler(sampler, batch_size=batch_size, drop_last=False),
+                      batch_size=None, num_workers=num_workers)
 
-train_dataset = TensorDataset(train_tensor_x,train_tensor_y) # create your datset
-train_loader = DataLoader(train_dataset, batch_size=256, shuffle=True,  num_workers=16) # create your dataloader
 
+# guarded so that DataLoader workers started with spawn (Windows / macOS) do not rerun the training
+if __name__ == "__main__":
+    x_path = "/mnt/spirit/ava_x.npy"
+    y_path = "/mnt/spirit/ava_y.npy"
 
-val_tensor_x = torch.Tensor(x[train_border:]) # transform to torch tensor
-val_tensor_y = torch.Tensor(y[train_border:])
+    n_samples = np.load(x_path, mmap_mode='r').shape[0]
 
-'''
-print(train_tensor_x.size())
-print(val_tensor_x.size())
-print( val_tensor_x.dtype)
-print( val_tensor_x[0].dtype)
-'''
+    val_percentage = 0.05 # 5% of the trainingdata will be used for validation
 
-val_dataset = TensorDataset(val_tensor_x,val_tensor_y) # create your datset
-val_loader = DataLoader(val_dataset, batch_size=512,  num_workers=16) # create your dataloader
+    permutation = np.random.default_rng(42).permutation(n_samples)   # random (reproducible) train / validation split
+    train_border = int(n_samples * (1 - val_percentage) )
 
+    train_dataset = MemmapEmbeddings(x_path, y_path, permutation[:train_border]) # create your datset
+    train_loader = batch_loader(train_dataset, batch_size=256, shuffle=True, num_workers=16) # create your dataloader
 
+    val_dataset = MemmapEmbeddings(x_path, y_path, permutation[train_border:]) # create your datset
+    val_loader = batch_loader(val_dataset, batch_size=512, shuffle=False, num_workers=16) # create your dataloader
 
 
-device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 
-model = MLP(768).to(device)   # CLIP embedding dim is 768 for CLIP ViT L 14
 
-optimizer = torch.optim.Adam(model.parameters()) 
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 
-# choose the loss you want to optimze for
-criterion = nn.MSELoss()
-criterion2 = nn.L1Loss()
+    model = MLP(768).to(device)   # CLIP embedding dim is 768 for CLIP ViT L 14
 
-epochs = 50
+    optimizer = torch.optim.Adam(model.parameters()) 
 
-model.train()
-best_loss =999
-save_name = "linear_predictor_L14_MSE.pth"
+    # choose the loss you want to optimze for
+    criterion = nn.MSELoss()
+    criterion2 = nn.L1Loss()
 
+    epochs = 50
 
-for epoch in range(epochs):
-    losses = []
-    losses2 = []
-    for batch_num, input_data in enumerate(train_loader):
-        optimizer.zero_grad()
-        x, y = input_data
-        x = x.to(device).float()
-        y = y.to(device)
+    model.train()
+    best_loss =999
+    save_name = "linear_predictor_L14_MSE.pth"
 
-        output = model(x)
-        loss = criterion(output, y)
-        loss.backward()
-        losses.append(loss.item())
 
+    for epoch in range(epochs):
+        losses = []
+        losses2 = []
+        for batch_num, input_data in enumerate(train_loader):
+            optimizer.zero_grad()
+            x, y = input_data
+            x = x.to(device).float()
+            y = y.to(device)
 
-        optimizer.step()
+            output = model(x)
+            loss = criterion(output, y)
+            loss.backward()
+            losses.append(loss.item())
 
-        if batch_num % 1000 == 0:
-            print('\tEpoch %d | Batch %d | Loss %6.2f' % (epoch, batch_num, loss.item()))
-            #print(y)
 
-    print('Epoch %d | Loss %6.2f' % (epoch, sum(losses)/len(losses)))
-    losses = []
-    losses2 = []
-    
-    for batch_num, input_data in enumerate(val_loader):
-        optimizer.zero_grad()
-        x, y = input_data
-        x = x.to(device).float()
-        y = y.to(device)
-
-        output = model(x)
-        loss = criterion(output, y)
-        lossMAE = criterion2(output, y)
-        #loss.backward()
-        losses.append(loss.item())
-        losses2.append(lossMAE.item())
-        #optimizer.step()
-
-        if batch_num % 1000 == 0:
-            print('\tValidation - Epoch %d | Batch %d | MSE Loss %6.2f' % (epoch, batch_num, loss.item()))
-            print('\tValidation - Epoch %d | Batch %d | MAE Loss %6.2f' % (epoch, batch_num, lossMAE.item()))
-            
-            #print(y)
-
-    print('Validation - Epoch %d | MSE Loss %6.2f' % (epoch, sum(losses)/len(losses)))
-    print('Validation - Epoch %d | MAE Loss %6.2f' % (epoch, sum(losses2)/len(losses2)))
-    if sum(losses)/len(losses) < best_loss:
-        print("Best MAE Val loss so far. Saving model")
-        best_loss = sum(losses)/len(losses)
-        print( best_loss ) 
-
-        torch.save(model.state_dict(), save_name )
-
-
-torch.save(model.state_dict(), save_name)
-
-print( best_loss ) 
-
-print("training done")
-# inferece test with dummy samples from the val set, sanity check
-print( "inferece test with dummy samples from the val set, sanity check")
-model.eval()
-output = model(x[:5].to(device))
-print(output.size())
-print(output)
+            optimizer.step()
+
+            if batch_num % 1000 == 0:
+                print('\tEpoch %d | Batch %d | Loss %6.2f' % (epoch, batch_num, loss.item()))
+                #print(y)
+
+        print('Epoch %d | Loss %6.2f' % (epoch, sum(losses)/len(losses)))
+        losses = []
+        losses2 = []
+
+        for batch_num, input_data in enumerate(val_loader):
+            optimizer.zero_grad()
+            x, y = input_data
+            x = x.to(device).float()
+            y = y.to(device)
+
+            output = model(x)
+            loss = criterion(output, y)
+            lossMAE = criterion2(output, y)
+            #loss.backward()
+            losses.append(loss.item())
+            losses2.append(lossMAE.item())
+            #optimizer.step()
+
+            if batch_num % 1000 == 0:
+                print('\tValidation - Epoch %d | Batch %d | MSE Loss %6.2f' % (epoch, batch_num, loss.item()))
+                print('\tValidation - Epoch %d | Batch %d | MAE Loss %6.2f' % (epoch, batch_num, lossMAE.item()))
+
+                #print(y)
+
+        print('Validation - Epoch %d | MSE Loss %6.2f' % (epoch, sum(losses)/len(losses)))
+        print('Validation - Epoch %d | MAE Loss %6.2f' % (epoch, sum(losses2)/len(losses2)))
+        if sum(losses)/len(losses) < best_loss:
+            print("Best MAE Val loss so far. Saving model")
+            best_loss = sum(losses)/len(losses)
+            print( best_loss ) 
+
+            torch.save(model.state_dict(), save_name )
+
+
+    torch.save(model.state_dict(), save_name)
+
+    print( best_loss ) 
+
+    print("training done")
+    # inferece test with dummy samples from the val set, sanity check
+    print( "inferece test with dummy samples from the val set, sanity check")
+    model.eval()
+    output = model(x[:5].to(device))
+    print(output.size())
+    print(output)
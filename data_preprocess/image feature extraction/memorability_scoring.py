@@ -0,0 +1,167 @@
+# memorability_scoring.py - ResMem 图片记忆度批量打分
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import torch
+from PIL import Image
+from resmem import ResMem, transformer
+
+
+class MemorabilityScorer:
+    """
+    ResMem 记忆度批量打分器
+
+    替代 notebook 中逐张调用的 pic_score_pre：模型只加载、只 eval() 一次，
+    图片解码交给线程池并行完成，推理按 batch 在 torch.inference_mode() 下进行。
+
+    参数:
+    -------
+    batch_size : int
+        每次送入模型的图片数量
+    num_workers : int
+        解码/预处理线程数
+    device : str, optional
+        推理设备，默认有 GPU 用 GPU，否则用 CPU
+    model : ResMem, optional
+        已加载的模型（不传则加载预训练 ResMem）
+    """
+
+    def __init__(self,
+                 batch_size: int = 64,
+                 num_workers: int = 4,
+                 device: Optional[str] = None,
+                 model: Optional[torch.nn.Module] = None):
+        self.batch_size = batch_size
+        self.num_workers = num_workers
+        self.device = device if device else ("cuda" if torch.cuda.is_available() else "cpu")
+        self.model = model if model is not None else ResMem(pretrained=True)
+        self.model.to(self.device)
+        self.model.eval()
+
+    @staticmethod
+    def _load_image(pic_path: str) -> Optional[torch.Tensor]:
+        """读取单张图片并做 ResMem 预处理，坏图返回 None"""
+        try:
+            img = Image.open(pic_path)
+            img = img.convert('RGB')
+            return transformer(img)
+        except Exception:
+            return None
+
+    def _iter_batches(self, paths: Sequence[str]) -> Iterator[Tuple[int, List[Optional[torch.Tensor]]]]:
+        """按 batch 产出预处理好的张量；下一批的解码与当前批的推理重叠进行"""
+        with ThreadPoolExecutor(max_workers=self.num_workers) as pool:
+            starts = range(0, len(paths), self.batch_size)
+            pending = None
+            for start in starts:
+                futures = [pool.submit(self._load_image, p) for p in paths[start:start + self.batch_size]]
+                if pending is not None:
+                    yield pending[0], [f.result() for f in pending[1]]
+                pending = (start, futures)
+            if pending is not None:
+                yield pending[0], [f.result() for f in pending[1]]
+
+    def score_paths(self,
+                    paths: Sequence[str],
+                    photo_ids: Optional[Sequence[str]] = None,
+                    verbose: bool = False) -> pd.DataFrame:
+        """
+        对一组图片路径打分
+
+        参数:
+        -------
+        paths : list
+            图片路径
+        photo_ids : list, optional
+            与 paths 一一对应的 photo_id，默认取文件名（去掉扩展名）
+        verbose : bool
+            是否打印进度
+
+        返回:
+        -------
+        result : pd.DataFrame
+            列为 photo_id, memory_score；保留 3 位小数，坏图记为 0（与原流程一致）
+        """
+        paths = list(paths)
+        if photo_ids is None:
+            photo_ids = [os.path.splitext(os.path.basename(p))[0] for p in paths]
+        scores = np.zeros(len(paths), dtype=np.float64)
+
+        with torch.inference_mode():
+            for start, tensors in self._iter_batches(paths):
+                ok = [i for i, t in enumerate(tensors) if t is not None]
+                if ok:
+                    batch = torch.stack([tensors[i] for i in ok]).to(self.device)
+                    prediction = self.model(batch.view(-1, 3, 227, 227))
+                    values = prediction[:, 0].float().cpu().tolist()
+                    for i, value in zip(ok, values):
+                        scores[start + i] = round(value, 3)
+                if verbose:
+                    print(f"{min(start + self.batch_size, len(paths))}/{len(paths)} scored, "
+                          f"{len(tensors) - len(ok)} failed in batch")
+
+        return pd.DataFrame({'photo_id': list(photo_ids), 'memory_score': scores})
+
+    def score_frame(self,
+                    pic_df: pd.DataFrame,
+                    pic_dir: str = './data/pic',
+                    verbose: bool = False) -> pd.DataFrame:
+        """
+        对 photos.xlsx 这类带 photo_id 列的数据框打分
+
+        参数:
+        -------
+        pic_df : pd.DataFrame
+            至少包含 photo_id 列
+        pic_dir : str
+            图片目录，图片名为 photo_id + '.jpg'
+
+        返回:
+        -------
+        result : pd.DataFrame
+            列为 photo_id, memory_score
+        """
+        photo_ids = pic_df['photo_id'].astype(str).tolist()
+        paths = [os.path.join(pic_dir, pid + '.jpg') for pid in photo_ids]
+        return self.score_paths(paths, photo_ids=photo_ids, verbose=verbose)
+
+
+def benchmark_throughput(paths: Sequence[str],
+                         batch_sizes: Sequence[int] = (1, 8, 32, 64),
+                         num_workers: int = 4,
+                         device: Optional[str] = None) -> pd.DataFrame:
+    """
+    不同 batch size 下的打分吞吐量（images/sec）
+
+    返回:
+    -------
+    result : pd.DataFrame
+        列为 batch_size, n_images, seconds, images_per_sec
+    """
+    model = ResMem(pretrained=True)
+    rows = []
+    for batch_size in batch_sizes:
+        scorer = MemorabilityScorer(batch_size=batch_size, num_workers=num_workers,
+                                    device=device, model=model)
+        start = time.perf_counter()
+        scorer.score_paths(paths)
+        seconds = time.perf_counter() - start
+        rows.append([batch_size, len(paths), seconds, len(paths) / seconds])
+        print(f"batch_size={batch_size:>4d}: {len(paths) / seconds:8.2f} images/sec ({seconds:.1f}s)")
+    return pd.DataFrame(rows, columns=['batch_size', 'n_images', 'seconds', 'images_per_sec'])
+
+
+if __name__ == "__main__":
+    import sys
+
+    # python memorability_scoring.py data/pic 500
+    # 对目录中前 N 张图片跑吞吐量测试
+    pic_dir = sys.argv[1] if len(sys.argv) > 1 else './data/pic'
+    n_images = int(sys.argv[2]) if len(sys.argv) > 2 else 256
+    sample = [os.path.join(pic_dir, p) for p in sorted(os.listdir(pic_dir)) if p.endswith('.jpg')][:n_images]
+    print(benchmark_throughput(sample).to_string(index=False))
@@ -0,0 +1,200 @@
+# object_counts.py - 批量 YOLO 物体检测，结果存为 图片 × COCO 类别 的稀疏计数矩阵
+
+import json
+import os
+import time
+from typing import List, NamedTuple, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+class ObjectCounts(NamedTuple):
+    """matrix[i, j] = 第 i 张图片中检测到的第 j 类物体个数（CSR, int16）"""
+    matrix: sparse.csr_matrix
+    photo_ids: List[str]
+    names: List[str]
+
+
+def _class_ids(result) -> np.ndarray:
+    return result.boxes.cls.cpu().numpy().astype(np.int64)
+
+
+def _predict_batch(model, image_paths: Sequence[str]) -> List[Optional[np.ndarray]]:
+    """
+    一次前向处理一个 batch；batch 中有坏图导致整体失败时退回逐张检测
+
+    返回:
+    -------
+    每张图片检测到的类别 id 数组；读取失败的图片为 None
+    """
+    try:
+        return [_class_ids(r) for r in model(list(image_paths), verbose=False)]
+    except Exception:
+        out = []
+        for image_path in image_paths:
+            try:
+                out.append(_class_ids(model(image_path, verbose=False)[0]))
+            except Exception:
+                out.append(None)
+        return out
+
+
+def detect_paths(image_paths: Sequence[str],
+                 model=None,
+                 model_path: str = 'data/pic/yolo11n.pt',
+                 batch_size: int = 32,
+                 photo_ids: Optional[Sequence[str]] = None,
+                 verbose: bool = True):
+    """
+    按 batch 流式跑 YOLO，直接累积 CSR 的 indptr / indices / data，不保存任何检测框或字符串
+
+    参数:
+    -------
+    image_paths : list
+        图片路径
+    model : ultralytics.YOLO, optional
+        已加载的模型；为 None 时从 model_path 加载
+    batch_size : int
+        每次送入模型的图片数
+    photo_ids : list, optional
+        默认取文件名去掉扩展名（与 result_object_detect_yolo11.txt 的 photo_id 一致）
+
+    返回:
+    -------
+    counts : ObjectCounts
+    failed : list
+        读取或检测失败的 photo_id（计数全为 0，与原来写入空列表一致）
+    """
+    if model is None:
+        from ultralytics import YOLO
+        model = YOLO(model_path)
+    image_paths = list(image_paths)
+    if photo_ids is None:
+        photo_ids = [os.path.splitext(os.path.basename(p))[0] for p in image_paths]
+    # model.names 只取一次
+    names = [model.names[i] for i in range(len(model.names))]
+    n_classes = len(names)
+
+    indptr, indices, data, failed = [0], [], [], []
+    start = time.perf_counter()
+    for batch_start in range(0, len(image_paths), batch_size):
+        batch = image_paths[batch_start:batch_start + batch_size]
+        for offset, cls in enumerate(_predict_batch(model, batch)):
+            if cls is None:
+                failed.append(photo_ids[batch_start + offset])
+                cls = np.empty(0, dtype=np.int64)
+            row = np.bincount(cls, minlength=n_classes)
+            nonzero = np.flatnonzero(row)
+            indices.append(nonzero)
+            data.append(row[nonzero])
+            indptr.append(indptr[-1] + len(nonzero))
+        if verbose:
+            done = batch_start + len(batch)
+            print(f"{done}/{len(image_paths)} images, "
+                  f"{done / (time.perf_counter() - start):.1f} images/sec, {len(failed)} failed")
+
+    matrix = sparse.csr_matrix(
+        (np.concatenate(data).astype(np.int16) if data else np.empty(0, dtype=np.int16),
+         np.concatenate(indices).astype(np.int32) if indices else np.empty(0, dtype=np.int32),
+         np.asarray(indptr, dtype=np.int64)),
+        shape=(len(image_paths), n_classes))
+    return ObjectCounts(matrix, list(photo_ids), names), failed
+
+
+def detect_directory(pic_dir: str = 'photos', **kwargs):
+    """对目录下全部 .jpg 按文件名排序后检测，参数同 detect_paths"""
+    image_paths = [os.path.join(pic_dir, p) for p in sorted(os.listdir(pic_dir)) if p.endswith('.jpg')]
+    return detect_paths(image_paths, **kwargs)
+
+
+def save_object_counts(counts: ObjectCounts, out_dir: str = 'data/pic/object_counts') -> None:
+    """counts.npz（CSR）+ photo_ids.txt（第 i 行对应矩阵第 i 行）+ names.json"""
+    os.makedirs(out_dir, exist_ok=True)
+    sparse.save_npz(os.path.join(out_dir, 'counts.npz'), counts.matrix)
+    with open(os.path.join(out_dir, 'photo_ids.txt'), 'w', encoding='utf-8') as f:
+        f.write('\n'.join(counts.photo_ids) + '\n')
+    with open(os.path.join(out_dir, 'names.json'), 'w', encoding='utf-8') as f:
+        json.dump(counts.names, f)
+
+
+def load_object_counts(out_dir: str = 'data/pic/object_counts') -> ObjectCounts:
+    matrix = sparse.load_npz(os.path.join(out_dir, 'counts.npz')).tocsr()
+    with open(os.path.join(out_dir, 'photo_ids.txt'), encoding='utf-8') as f:
+        photo_ids = [line.rstrip('\n') for line in f if line.strip()]
+    with open(os.path.join(out_dir, 'names.json'), encoding='utf-8') as f:
+        names = json.load(f)
+    return ObjectCounts(matrix, photo_ids, names)
+
+
+def person_variables(counts: ObjectCounts) -> pd.DataFrame:
+    """
+    由计数矩阵直接得到人物变量，不再解析 objects_content 字符串
+
+    返回:
+    -------
+    result : pd.DataFrame
+        photo_id, person_count, person_exist,
+        person_total_count（检测到的物体总数，同 process_data 中的 len(temp)）,
+        var（|person - 其他物体| / 物体总数，总数为 0 时为 0，同 process_data）
+    """
+    matrix = counts.matrix
+    person = np.asarray(matrix[:, counts.names.index('person')].todense()).ravel().astype(np.int64)
+    total = np.asarray(matrix.sum(axis=1)).ravel().astype(np.int64)
+    other = total - person
+    var = np.divide(np.abs(person - other), total, out=np.zeros(len(total)), where=total > 0)
+    return pd.DataFrame({'photo_id': counts.photo_ids,
+                         'person_count': person,
+                         'person_exist': (person > 0).astype(np.int64),
+                         'person_total_count': total,
+                         'var': var})
+
+
+def objects_content(counts: ObjectCounts) -> List[str]:
+    """旧 person_result.xlsx 的 objects_content 列（"类别, 类别, ..."，按类别 id 排序）"""
+    matrix, names = counts.matrix, counts.names
+    out = []
+    for i in range(matrix.shape[0]):
+        lo, hi = matrix.indptr[i], matrix.indptr[i + 1]
+        out.append(', '.join(name for j, c in zip(matrix.indices[lo:hi], matrix.data[lo:hi])
+                             for name in [names[j]] * int(c)))
+    return out
+
+
+def benchmark_throughput(image_paths: Sequence[str],
+                         batch_sizes: Sequence[int] = (1, 8, 32, 64),
+                         model_path: str = 'data/pic/yolo11n.pt') -> pd.DataFrame:
+    """
+    不同 batch size 下的检测吞吐量（images/sec）
+
+    返回:
+    -------
+    result : pd.DataFrame
+        列为 batch_size, n_images, seconds, images_per_sec
+    """
+    from ultralytics import YOLO
+    model = YOLO(model_path)
+    rows = []
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        detect_paths(image_paths, model=model, batch_size=batch_size, verbose=False)
+        seconds = time.perf_counter() - start
+        rows.append([batch_size, len(image_paths), seconds, len(image_paths) / seconds])
+        print(f"batch_size={batch_size:>4d}: {len(image_paths) / seconds:8.2f} images/sec ({seconds:.1f}s)")
+    return pd.DataFrame(rows, columns=['batch_size', 'n_images', 'seconds', 'images_per_sec'])
+
+
+if __name__ == "__main__":
+    import sys
+
+    # python object_counts.py photos data/pic/object_counts 32
+    pic_dir = sys.argv[1] if len(sys.argv) > 1 else 'photos'
+    out_dir = sys.argv[2] if len(sys.argv) > 2 else 'data/pic/object_counts'
+    batch_size = int(sys.argv[3]) if len(sys.argv) > 3 else 32
+
+    counts, failed_ids = detect_directory(pic_dir, batch_size=batch_size)
+    save_object_counts(counts, out_dir)
+    person_variables(counts).to_parquet(os.path.join(out_dir, 'person_variables.parquet'), index=False)
+    print(f"saved {counts.matrix.shape[0]} photos, {counts.matrix.nnz} non-zero counts, "
+          f"{len(failed_ids)} failed to {out_dir}")
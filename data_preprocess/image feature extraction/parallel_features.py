@@ -0,0 +1,101 @@
+# parallel_features.py - 多进程并行抽取 OpenCV 图片特征（data/pic）
+
+import os
+import time
+from multiprocessing import Pool
+from typing import List, Optional, Sequence, Tuple
+
+import cv2
+import pandas as pd
+
+from image_features import ImageFeatures, extract_all_features, warm_up
+
+_LEGACY_SHARPNESS = True
+
+
+def _init_worker(legacy_sharpness: bool) -> None:
+    """每个 worker 进程只初始化一次：加载 Haar 分类器、分配颜色位图（image_features.warm_up）；
+    OpenCV 内部线程设为 1，避免与进程池抢核"""
+    global _LEGACY_SHARPNESS
+    _LEGACY_SHARPNESS = legacy_sharpness
+    cv2.setNumThreads(1)
+    warm_up()
+
+
+def _extract(image_path: str) -> Optional[ImageFeatures]:
+    try:
+        return extract_all_features(image_path, legacy_sharpness=_LEGACY_SHARPNESS)
+    except Exception:
+        return None
+
+
+def extract_paths(image_paths: Sequence[str],
+                  processes: Optional[int] = None,
+                  chunksize: int = 32,
+                  legacy_sharpness: bool = True,
+                  verbose: bool = True) -> Tuple[pd.DataFrame, List[str]]:
+    """
+    用进程池并行抽取图片特征，输出顺序与输入顺序一致
+
+    参数:
+    -------
+    image_paths : list
+        图片路径
+    processes : int, optional
+        进程数，默认 CPU 核数
+    chunksize : int
+        每次分发给 worker 的图片数
+    legacy_sharpness : bool
+        见 image_features.extract_all_features
+
+    返回:
+    -------
+    features : pd.DataFrame
+        generate_result.xlsx 格式的特征表（不含失败图片）
+    failed : list
+        读取或计算失败的图片路径
+    """
+    image_paths = list(image_paths)
+    processes = processes or os.cpu_count()
+    records, failed = [], []
+    start = time.perf_counter()
+    report_every = max(chunksize * processes, 1000)
+
+    with Pool(processes=processes, initializer=_init_worker, initargs=(legacy_sharpness,)) as pool:
+        for count, (image_path, features) in enumerate(
+                zip(image_paths, pool.imap(_extract, image_paths, chunksize=chunksize)), 1):
+            if features is None:
+                failed.append(image_path)
+            else:
+                records.append(features)
+            if verbose and count % report_every == 0:
+                elapsed = time.perf_counter() - start
+                print(f"{count}/{len(image_paths)} images, {count / elapsed:.1f} images/sec, {len(failed)} failed")
+
+    elapsed = time.perf_counter() - start
+    if verbose:
+        print(f"done: {len(records)} ok, {len(failed)} failed, {elapsed:.1f}s, "
+              f"{len(image_paths) / max(elapsed, 1e-9):.1f} images/sec on {processes} processes")
+    return pd.DataFrame(records, columns=ImageFeatures._fields), failed
+
+
+def extract_directory(pic_dir: str = './data/pic', **kwargs) -> Tuple[pd.DataFrame, List[str]]:
+    """对目录下全部 .jpg 按文件名排序后并行抽取，参数同 extract_paths"""
+    image_paths = [os.path.join(pic_dir, p) for p in sorted(os.listdir(pic_dir)) if p.endswith('.jpg')]
+    return extract_paths(image_paths, **kwargs)
+
+
+if __name__ == "__main__":
+    import sys
+
+    # python parallel_features.py data/pic generate_result.xlsx 32
+    pic_dir = sys.argv[1] if len(sys.argv) > 1 else './data/pic'
+    output_path = sys.argv[2] if len(sys.argv) > 2 else 'generate_result.xlsx'
+    processes = int(sys.argv[3]) if len(sys.argv) > 3 else None
+
+    result_df, failed_paths = extract_directory(pic_dir, processes=processes)
+    if output_path.endswith('.xlsx'):
+        result_df.to_excel(output_path, index=False)
+    else:
+        result_df.to_parquet(output_path, index=False)
+    print(f"saved {len(result_df)} rows to {output_path}")
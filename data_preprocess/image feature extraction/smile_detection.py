@@ -0,0 +1,158 @@
+# smile_detection.py - 缩图 + 复用分类器的人脸/笑脸检测（number_face, smiling_faces_count）
+
+import os
+import time
+from multiprocessing import Pool
+from typing import List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+import pandas as pd
+
+from image_features import count_smiling_faces, decode_image, detect_faces, warm_up
+
+
+class SmileDetector:
+    """
+    image_features.count_smiling_faces 的固定参数版本（检测流程只有那一份，参数不会各自漂移）
+
+    - 两个 CascadeClassifier 每个进程只加载一次（image_features.warm_up）
+    - 人脸检测在长边缩到 max_side 的灰度图上进行，检测框再按比例放回原图坐标
+    - 笑脸仍在原分辨率的人脸区域上检测，参数不变
+
+    参数:
+    -------
+    max_side : int, optional
+        人脸检测用图的最长边；None 或不大于该值的图片不缩放（结果与原实现一致）
+    min_face : int
+        原图上的人脸最小尺寸（原实现 minSize=(30, 30)）
+    """
+
+    def __init__(self, max_side: Optional[int] = 640, min_face: int = 30):
+        self.max_side = max_side
+        self.min_face = min_face
+        warm_up()
+
+    def detect_faces(self, gray: np.ndarray) -> np.ndarray:
+        """返回原图坐标下的人脸框 (n, 4)，格式 x, y, w, h"""
+        return detect_faces(gray, self.max_side, self.min_face)
+
+    def detect(self, gray: np.ndarray) -> Tuple[int, int]:
+        """返回 (number_face, smiling_faces_count)"""
+        return count_smiling_faces(gray, self.max_side, self.min_face)
+
+    def detect_path(self, image_path: str) -> Tuple[int, int]:
+        return self.detect(cv2.cvtColor(decode_image(image_path), cv2.COLOR_BGR2GRAY))
+
+
+def detect_smiling_faces_original(gray: np.ndarray) -> Tuple[int, int]:
+    """原 notebook 的做法（每张图重新加载两个分类器、全分辨率检测），只作为 benchmark 的基准"""
+    face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    smile_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_smile.xml')
+    faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30),
+                                          flags=cv2.CASCADE_SCALE_IMAGE)
+    smiling_faces_count = 0
+    for (x, y, w, h) in faces:
+        smiles = smile_cascade.detectMultiScale(gray[y:y + h, x:x + w], scaleFactor=1.8, minNeighbors=20,
+                                                minSize=(25, 25), flags=cv2.CASCADE_SCALE_IMAGE)
+        if len(smiles) > 0:
+            smiling_faces_count += 1
+    return len(faces), smiling_faces_count
+
+
+_DETECTOR = None
+
+
+def _init_worker(max_side: Optional[int], min_face: int) -> None:
+    global _DETECTOR
+    cv2.setNumThreads(1)
+    _DETECTOR = SmileDetector(max_side=max_side, min_face=min_face)
+
+
+def _detect(image_path: str) -> Optional[Tuple[int, int]]:
+    try:
+        return _DETECTOR.detect_path(image_path)
+    except Exception:
+        return None
+
+
+def detect_paths(image_paths: Sequence[str],
+                 max_side: Optional[int] = 640,
+                 min_face: int = 30,
+                 processes: Optional[int] = None,
+                 chunksize: int = 32,
+                 verbose: bool = True) -> Tuple[pd.DataFrame, List[str]]:
+    """
+    进程池并行检测，输出顺序与输入顺序一致
+
+    返回:
+    -------
+    result : pd.DataFrame
+        pic_filename, number_face, smiling_faces_count（不含失败图片）
+    failed : list
+        读取失败的图片路径
+    """
+    image_paths = list(image_paths)
+    processes = processes or os.cpu_count()
+    records, failed = [], []
+    start = time.perf_counter()
+    with Pool(processes=processes, initializer=_init_worker, initargs=(max_side, min_face)) as pool:
+        for image_path, res in zip(image_paths, pool.imap(_detect, image_paths, chunksize=chunksize)):
+            if res is None:
+                failed.append(image_path)
+            else:
+                records.append((os.path.splitext(os.path.basename(image_path))[0],) + res)
+    if verbose:
+        elapsed = time.perf_counter() - start
+        print(f"done: {len(records)} ok, {len(failed)} failed, "
+              f"{len(image_paths) / max(elapsed, 1e-9):.1f} images/sec on {processes} processes")
+    return pd.DataFrame(records, columns=['pic_filename', 'number_face', 'smiling_faces_count']), failed
+
+
+def benchmark_agreement(image_paths: Sequence[str],
+                        max_sides: Sequence[Optional[int]] = (None, 1280, 960, 640, 480)) -> pd.DataFrame:
+    """
+    单进程比较原实现（每张图加载分类器、全分辨率）与 SmileDetector 在不同 max_side 下的耗时和结果一致性；
+    max_side=None 只复用分类器、不缩图，结果应与原实现完全一致
+
+    返回:
+    -------
+    result : pd.DataFrame
+        max_side, seconds, speedup, face_agree（number_face 完全一致的比例）,
+        smile_agree, face_mad / smile_mad（平均绝对差）
+    """
+    grays = []
+    for image_path in image_paths:
+        try:
+            grays.append(cv2.cvtColor(decode_image(image_path), cv2.COLOR_BGR2GRAY))
+        except ValueError:
+            continue
+
+    start = time.perf_counter()
+    reference = np.array([detect_smiling_faces_original(gray) for gray in grays]).reshape(-1, 2)
+    base_seconds = time.perf_counter() - start
+
+    rows = [['original', base_seconds, 1.0, 1.0, 1.0, 0.0, 0.0]]
+    for max_side in max_sides:
+        detector = SmileDetector(max_side=max_side)
+        start = time.perf_counter()
+        result = np.array([detector.detect(gray) for gray in grays]).reshape(-1, 2)
+        seconds = time.perf_counter() - start
+        agree = (result == reference).mean(axis=0)
+        mad = np.abs(result - reference).mean(axis=0)
+        rows.append([max_side, seconds, base_seconds / seconds, agree[0], agree[1], mad[0], mad[1]])
+    result = pd.DataFrame(rows, columns=['max_side', 'seconds', 'speedup', 'face_agree', 'smile_agree',
+                                         'face_mad', 'smile_mad'])
+    print(f"{len(grays)} images")
+    print(result.to_string(index=False))
+    return result
+
+
+if __name__ == "__main__":
+    import sys
+
+    # python smile_detection.py data/pic 500
+    pic_dir = sys.argv[1] if len(sys.argv) > 1 else './data/pic'
+    n_images = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    sample = [os.path.join(pic_dir, p) for p in sorted(os.listdir(pic_dir)) if p.endswith('.jpg')][:n_images]
+    benchmark_agreement(sample)
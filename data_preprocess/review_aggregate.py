@@ -0,0 +1,236 @@
+# review_aggregate.py - 分块、可合并的商家级评论汇总（生成 review_result.csv）
+
+import os
+import tempfile
+from multiprocessing import Pool
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# 求均值的列：review_merge 中的列名 -> review_result.csv 中的列名
+MEAN_COLUMNS = {'stars': 'star_avg', 'score': 'contents_score_avg', 'useful': 'useful_avg',
+                'funny': 'funny_avg', 'cool': 'cool_avg'}
+RESULT_COLUMNS = ['business_id', 'user_count', 'star_avg', 'star_std', 'contents_score_avg',
+                  'useful_avg', 'funny_avg', 'cool_avg']
+REVIEW_MERGE_COLUMNS = ['user_id', 'business_id', 'stars', 'useful', 'funny', 'cool', 'score']
+
+
+def _unique_pairs(codes: np.ndarray, hashes: np.ndarray):
+    """按 (商家编码, 用户哈希) 排序去重"""
+    order = np.lexsort((hashes, codes))
+    codes, hashes = codes[order], hashes[order]
+    keep = np.ones(len(codes), dtype=bool)
+    keep[1:] = (codes[1:] != codes[:-1]) | (hashes[1:] != hashes[:-1])
+    return codes[keep], hashes[keep]
+
+
+class ReviewAggState:
+    """
+    商家级的部分汇总状态，任意两个状态可以合并（顺序无关）
+
+    - sums：按 business_id 索引，每个均值列的非空个数 <col>_n、和 <col>_sum，stars 另有平方和 stars_sq
+    - pairs：每个块一份 (business_id 的 Index, 商家编码 int64 数组, user_id 的 64 位哈希 uint64 数组)，
+      块内已去重；合并时只追加，不同块之间的重复在 result() 中统一去掉，用于精确计算 nunique(user_id)。
+      business_id 字符串每个块每个商家只存一份，不随评论数增长
+    """
+
+    def __init__(self, sums: Optional[pd.DataFrame] = None,
+                 pairs: Optional[List[Tuple[pd.Index, np.ndarray, np.ndarray]]] = None):
+        self.sums = sums if sums is not None else pd.DataFrame()
+        self.pairs = pairs if pairs is not None else []
+
+    @classmethod
+    def from_chunk(cls, df: pd.DataFrame) -> 'ReviewAggState':
+        """df 至少包含 business_id, user_id 和 MEAN_COLUMNS 中的列"""
+        df = df[df['business_id'].notna()]
+        groups = df['business_id']
+        sums = {}
+        for col in MEAN_COLUMNS:
+            values = pd.to_numeric(df[col], errors='coerce')
+            sums[col + '_n'] = values.notna().groupby(groups).sum()
+            sums[col + '_sum'] = values.groupby(groups).sum()
+            if col == 'stars':
+                sums['stars_sq'] = (values ** 2).groupby(groups).sum()
+        users = df[df['user_id'].notna()]
+        codes, businesses = pd.factorize(users['business_id'])
+        hashes = pd.util.hash_array(users['user_id'].astype(str).to_numpy(dtype=object))
+        codes, hashes = _unique_pairs(codes.astype(np.int64), hashes)
+        return cls(pd.DataFrame(sums).astype(np.float64), [(pd.Index(businesses), codes, hashes)])
+
+    def merge(self, other: 'ReviewAggState') -> 'ReviewAggState':
+        sums = self.sums.add(other.sums, fill_value=0) if len(self.sums) else other.sums
+        return ReviewAggState(sums, self.pairs + other.pairs)
+
+    def user_counts(self, businesses: pd.Index) -> np.ndarray:
+        """每个商家的不同 user_id 个数（按 businesses 的顺序）"""
+        if not self.pairs:
+            return np.zeros(len(businesses), dtype=np.int64)
+        codes = np.concatenate([businesses.get_indexer(index)[part] for index, part, _ in self.pairs])
+        hashes = np.concatenate([part for _, _, part in self.pairs])
+        codes, _ = _unique_pairs(codes, hashes)
+        return np.bincount(codes, minlength=len(businesses)).astype(np.int64)
+
+    def result(self, ddof: int = 1) -> pd.DataFrame:
+        """
+        原 groupby('business_id').agg 的列，按 business_id 排序：user_count 为 nunique，
+        各均值忽略缺失值
+
+        star_std 的自由度需要明确指定：notebook 在 pandas 1.x（Python 3.9）下运行，
+        agg 中的 np.std 被替换为 Series.std，即样本标准差 ddof=1（只有一条评论时为 NaN），
+        已有的 review_result.csv 是这样生成的，默认与之一致。pandas 3 不再做这种替换，
+        同样的 notebook 代码会调用 np.std（ddof=0，只有一条评论时为 0）；ddof=0 可复现这一结果
+
+        参数:
+        -------
+        ddof : int
+            star_std 的自由度修正，1（默认）或 0
+        """
+        sums = self.sums.sort_index()
+        out = pd.DataFrame(index=sums.index)
+        out['user_count'] = self.user_counts(sums.index)
+        for col, name in MEAN_COLUMNS.items():
+            n = sums[col + '_n']
+            out[name] = (sums[col + '_sum'] / n).where(n > 0)
+            if col == 'stars':
+                ss = (sums['stars_sq'] - sums['stars_sum'] ** 2 / n).clip(lower=0)
+                out['star_std'] = np.sqrt(ss / (n - ddof)).where(n > ddof)
+        out.index.name = 'business_id'
+        return out.reset_index()[RESULT_COLUMNS]
+
+
+def aggregate_chunks(chunks: Iterable[pd.DataFrame]) -> ReviewAggState:
+    state = ReviewAggState()
+    for chunk in chunks:
+        state = state.merge(ReviewAggState.from_chunk(chunk))
+    return state
+
+
+def iter_csv(path: str = './data/excel/review_merge.csv', chunk_rows: int = 500000) -> Iterator[pd.DataFrame]:
+    yield from pd.read_csv(path, usecols=REVIEW_MERGE_COLUMNS, chunksize=chunk_rows)
+
+
+def iter_parquet(path: str, scores: Optional[pd.DataFrame] = None, chunk_rows: int = 500000) -> Iterator[pd.DataFrame]:
+    """
+    按块读取一个 Parquet 文件；给出 scores（review_id 不重复的情感分数，如同一个桶的分数）时按 review_id 补上 score 列
+    """
+    columns = REVIEW_MERGE_COLUMNS if scores is None else \
+        ['review_id'] + [c for c in REVIEW_MERGE_COLUMNS if c != 'score']
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=columns):
+        chunk = batch.to_pandas()
+        if scores is not None:
+            chunk = chunk.merge(scores, on='review_id', how='left')
+        yield chunk
+
+
+def _parquet_files(path: str) -> List[str]:
+    if os.path.isdir(path):
+        return [os.path.join(path, f) for f in sorted(os.listdir(path)) if f.endswith('.parquet')]
+    return [path]
+
+
+def partition_by_review_id(source: str, columns: List[str], out_dir: str,
+                           n_buckets: int = 64, chunk_rows: int = 500000) -> None:
+    """
+    流式地把 Parquet 表按 hash(review_id) % n_buckets 拆成 out_dir/bucket-XXXXX.parquet，
+    同一 review_id 总在同一个桶里，桶内保持原来的行顺序；内存只与 chunk_rows 有关
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    writers = {}
+    try:
+        for file_path in _parquet_files(source):
+            for batch in pq.ParquetFile(file_path).iter_batches(batch_size=chunk_rows, columns=columns):
+                table = pa.Table.from_batches([batch])
+                ids = table.column('review_id').to_numpy(zero_copy_only=False)
+                buckets = pd.util.hash_array(ids.astype(object)) % np.uint64(n_buckets)
+                order = np.argsort(buckets, kind='stable')
+                bounds = np.flatnonzero(np.r_[True, np.diff(buckets[order]) != 0, True])
+                for lo, hi in zip(bounds[:-1], bounds[1:]):
+                    bucket = int(buckets[order[lo]])
+                    if bucket not in writers:
+                        writers[bucket] = pq.ParquetWriter(
+                            os.path.join(out_dir, f'bucket-{bucket:05d}.parquet'), table.schema)
+                    writers[bucket].write_table(table.take(order[lo:hi]))
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+
+def _aggregate_file(path: str) -> ReviewAggState:
+    return aggregate_chunks(iter_parquet(path))
+
+
+def _aggregate_bucket(paths: Tuple[str, str]) -> ReviewAggState:
+    """一个桶的评论与同一个桶的情感分数按 review_id 合并后汇总（与 load_scores 相同，重复的 review_id 取最后一条）"""
+    review_path, score_path = paths
+    if os.path.exists(score_path):
+        scores = pd.read_parquet(score_path).drop_duplicates('review_id', keep='last')
+    else:
+        scores = pd.DataFrame({'review_id': pd.Series(dtype=object), 'score': pd.Series(dtype=np.float64)})
+    return aggregate_chunks(iter_parquet(review_path, scores))
+
+
+def aggregate_parquet(review_dir: str,
+                      sentiment_dir: Optional[str] = None,
+                      processes: Optional[int] = None,
+                      n_buckets: int = 64,
+                      work_dir: Optional[str] = None) -> pd.DataFrame:
+    """
+    每个 Parquet 文件由一个进程分块汇总，得到的部分状态再合并
+
+    给出 sentiment_dir 时，评论和情感分数先都按 review_id 的哈希流式拆成 n_buckets 个桶，
+    每个进程只把一个桶的评论与同一个桶的分数合并，内存约为整张表的 1 / n_buckets，
+    不随进程数增加（不再在每个进程中加载整张分数表）
+
+    参数:
+    -------
+    review_dir : str
+        Parquet 目录；含 score 列（review_merge），或与 sentiment_dir 一起使用
+        （yelp_parquet 输出的 review 表 + review_sentiment 的分数）
+    sentiment_dir : str, optional
+        review_sentiment 的输出目录
+    processes : int, optional
+        进程数，默认 CPU 核数
+    n_buckets : int
+        按 review_id 拆分的桶数
+    work_dir : str, optional
+        存放临时桶文件的目录，默认系统临时目录，用完删除
+
+    返回:
+    -------
+    result : pd.DataFrame
+        review_result.csv 的列
+    """
+    state = ReviewAggState()
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp_dir:
+        if sentiment_dir is None:
+            tasks, worker = _parquet_files(review_dir), _aggregate_file
+        else:
+            review_columns = ['review_id'] + [c for c in REVIEW_MERGE_COLUMNS if c != 'score']
+            partition_by_review_id(review_dir, review_columns, os.path.join(tmp_dir, 'review'), n_buckets)
+            partition_by_review_id(sentiment_dir, ['review_id', 'score'], os.path.join(tmp_dir, 'score'), n_buckets)
+            tasks = [(os.path.join(tmp_dir, 'review', f), os.path.join(tmp_dir, 'score', f))
+                     for f in sorted(os.listdir(os.path.join(tmp_dir, 'review')))]
+            worker = _aggregate_bucket
+        with Pool(processes=processes or os.cpu_count()) as pool:
+            for part_state in pool.imap_unordered(worker, tasks):
+                state = state.merge(part_state)
+    return state.result()
+
+
+if __name__ == "__main__":
+    import sys
+
+    # python review_aggregate.py ./data/excel/review_merge.csv ./data/excel/review_result.csv
+    # python review_aggregate.py ./data/parquet/yelp_academic_dataset_review ./data/excel/review_result.csv ./data/parquet/review_sentiment
+    input_path = sys.argv[1] if len(sys.argv) > 1 else './data/excel/review_merge.csv'
+    output_path = sys.argv[2] if len(sys.argv) > 2 else './data/excel/review_result.csv'
+    sentiment_dir = sys.argv[3] if len(sys.argv) > 3 else None
+    if input_path.endswith('.csv'):
+        result = aggregate_chunks(iter_csv(input_path)).result()
+    else:
+        result = aggregate_parquet(input_path, sentiment_dir)
+    result.to_csv(output_path, index=False)
+    print(f"saved {len(result)} businesses to {output_path}")
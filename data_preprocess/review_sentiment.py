@@ -0,0 +1,157 @@
+# review_sentiment.py - 多进程 VADER 情感打分，结果按 review_id 持久化，可断点续跑
+
+import os
+import time
+from collections import deque
+from multiprocessing import Pool
+from typing import Iterator, List, Optional, Set, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# 每个 worker 进程一份 SentimentIntensityAnalyzer
+_ANALYZER = None
+
+SCORE_SCHEMA = pa.schema([('review_id', pa.string()), ('score', pa.float64())])
+
+
+def _init_worker() -> None:
+    global _ANALYZER
+    from nltk.sentiment import SentimentIntensityAnalyzer
+    _ANALYZER = SentimentIntensityAnalyzer()
+
+
+def _score_chunk(chunk: Tuple[List[str], List[Optional[str]]]) -> Tuple[List[str], List[float]]:
+    """与 analyze_sentiment 相同取 compound 分数；空评论记 0"""
+    review_ids, texts = chunk
+    scores = [_ANALYZER.polarity_scores(text)['compound'] if isinstance(text, str) else 0.0 for text in texts]
+    return review_ids, scores
+
+
+def iter_review_chunks(review_path: str, chunk_rows: int = 10000) -> Iterator[pd.DataFrame]:
+    """
+    按块读取 review_id 和 text 两列
+
+    review_path 可以是 yelp_parquet 输出的 Parquet 目录 / 文件，也可以是原来的
+    yelp_academic_dataset_review.csv
+    """
+    if review_path.endswith('.csv'):
+        yield from pd.read_csv(review_path, usecols=['review_id', 'text'], chunksize=chunk_rows)
+        return
+    files = ([os.path.join(review_path, f) for f in sorted(os.listdir(review_path)) if f.endswith('.parquet')]
+             if os.path.isdir(review_path) else [review_path])
+    for file_path in files:
+        for batch in pq.ParquetFile(file_path).iter_batches(batch_size=chunk_rows, columns=['review_id', 'text']):
+            yield batch.to_pandas()
+
+
+def scored_ids(out_dir: str) -> Set[str]:
+    """已经打过分的 review_id（只读 review_id 一列）"""
+    if not os.path.isdir(out_dir):
+        return set()
+    done = set()
+    for f in os.listdir(out_dir):
+        if f.endswith('.parquet'):
+            done.update(pq.read_table(os.path.join(out_dir, f), columns=['review_id']).column(0).to_pylist())
+    return done
+
+
+def _write_part(out_dir: str, part: int, review_ids: List[str], scores: List[float]) -> None:
+    # 先写临时文件再改名，中断时不会留下半个 part
+    path = os.path.join(out_dir, f'part-{part:06d}.parquet')
+    table = pa.Table.from_arrays([pa.array(review_ids, pa.string()), pa.array(scores, pa.float64())],
+                                 schema=SCORE_SCHEMA)
+    pq.write_table(table, path + '.tmp')
+    os.replace(path + '.tmp', path)
+
+
+def score_reviews(review_path: str,
+                  out_dir: str = './data/parquet/review_sentiment',
+                  processes: Optional[int] = None,
+                  chunk_rows: int = 10000,
+                  verbose: bool = True) -> int:
+    """
+    对尚未打分的评论并行计算情感分数
+
+    参数:
+    -------
+    review_path : str
+        评论数据（Parquet 目录/文件或 CSV），需要 review_id 和 text 列
+    out_dir : str
+        分数存放目录，每个块一个 part-*.parquet（review_id, score）
+    processes : int, optional
+        进程数，默认 CPU 核数
+    chunk_rows : int
+        每个任务的评论条数
+
+    返回:
+    -------
+    本次新打分的评论条数
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    for f in os.listdir(out_dir):
+        if f.endswith('.tmp'):
+            os.remove(os.path.join(out_dir, f))
+    done = scored_ids(out_dir)
+    parts = [int(f[5:11]) for f in os.listdir(out_dir) if f.startswith('part-') and f.endswith('.parquet')]
+    part = max(parts) + 1 if parts else 0
+
+    def todo() -> Iterator[Tuple[List[str], List[Optional[str]]]]:
+        for chunk in iter_review_chunks(review_path, chunk_rows):
+            if done:
+                chunk = chunk[~chunk['review_id'].isin(done)]
+            if len(chunk):
+                yield (chunk['review_id'].tolist(),
+                       [t if isinstance(t, str) else None for t in chunk['text'].tolist()])
+
+    processes = processes or os.cpu_count()
+    n_scored = 0
+    start = time.perf_counter()
+
+    def save(result: Tuple[List[str], List[float]]) -> None:
+        nonlocal part, n_scored
+        review_ids, scores = result
+        _write_part(out_dir, part, review_ids, scores)
+        part += 1
+        n_scored += len(review_ids)
+        if verbose:
+            print(f"{n_scored} reviews scored, {n_scored / (time.perf_counter() - start):.0f} reviews/sec "
+                  f"({len(done)} skipped)")
+
+    # Pool.imap 会一次性把输入迭代器读完，这里最多只让 2 * processes 个块在途，内存有界
+    pending = deque()
+    with Pool(processes=processes, initializer=_init_worker) as pool:
+        for chunk in todo():
+            pending.append(pool.apply_async(_score_chunk, (chunk,)))
+            if len(pending) >= 2 * processes:
+                save(pending.popleft().get())
+        while pending:
+            save(pending.popleft().get())
+    return n_scored
+
+
+def load_scores(out_dir: str = './data/parquet/review_sentiment') -> pd.DataFrame:
+    """review_id, score；同一 review_id 只保留一条"""
+    scores = pd.read_parquet(out_dir)
+    return scores.drop_duplicates('review_id', keep='last').reset_index(drop=True)
+
+
+def merge_review_scores(review: pd.DataFrame, out_dir: str = './data/parquet/review_sentiment') -> pd.DataFrame:
+    """
+    按 review_id 合并情感分数（替代原来按行位置的 pd.concat(axis=1)），得到 review_merge 的列
+    user_id, business_id, stars, useful, funny, cool, score
+    """
+    df = review.merge(load_scores(out_dir), on='review_id', how='left', validate='many_to_one')
+    return df[['user_id', 'business_id', 'stars', 'useful', 'funny', 'cool', 'score']]
+
+
+if __name__ == "__main__":
+    import sys
+
+    # python review_sentiment.py ./data/parquet/yelp_academic_dataset_review ./data/parquet/review_sentiment 8
+    review_path = sys.argv[1] if len(sys.argv) > 1 else './data/parquet/yelp_academic_dataset_review'
+    out_dir = sys.argv[2] if len(sys.argv) > 2 else './data/parquet/review_sentiment'
+    processes = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    n = score_reviews(review_path, out_dir, processes=processes)
+    print(f"{n} new reviews scored, saved to {out_dir}")
@@ -0,0 +1,206 @@
+# yelp_parquet.py - Yelp JSON lines 流式转换为分片 Parquet（带类型 schema，内存有界）
+
+import json
+import os
+import shutil
+import time
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# 嵌套字段（attributes / hours）以 JSON 字符串保存
+SCHEMAS: Dict[str, pa.Schema] = {
+    'business': pa.schema([
+        ('business_id', pa.string()),
+        ('name', pa.string()),
+        ('address', pa.string()),
+        ('city', pa.string()),
+        ('state', pa.string()),
+        ('postal_code', pa.string()),
+        ('latitude', pa.float64()),
+        ('longitude', pa.float64()),
+        ('stars', pa.float64()),
+        ('review_count', pa.int64()),
+        ('is_open', pa.int64()),
+        ('attributes', pa.string()),
+        ('categories', pa.string()),
+        ('hours', pa.string()),
+    ]),
+    'review': pa.schema([
+        ('review_id', pa.string()),
+        ('user_id', pa.string()),
+        ('business_id', pa.string()),
+        ('stars', pa.float64()),
+        ('useful', pa.int64()),
+        ('funny', pa.int64()),
+        ('cool', pa.int64()),
+        ('text', pa.string()),
+        ('date', pa.string()),
+    ]),
+    'tip': pa.schema([
+        ('user_id', pa.string()),
+        ('business_id', pa.string()),
+        ('text', pa.string()),
+        ('date', pa.string()),
+        ('compliment_count', pa.int64()),
+    ]),
+    'photo': pa.schema([
+        ('photo_id', pa.string()),
+        ('business_id', pa.string()),
+        ('caption', pa.string()),
+        ('label', pa.string()),
+    ]),
+}
+
+# Excel 单个 sheet 的最大行数（含表头）
+EXCEL_MAX_ROWS = 1048576
+
+
+def dataset_name(json_path: str) -> str:
+    """yelp_academic_dataset_review.json -> 'review'"""
+    stem = os.path.splitext(os.path.basename(json_path))[0]
+    name = stem.replace('yelp_academic_dataset_', '')
+    if name not in SCHEMAS:
+        raise ValueError(f"no schema for {json_path}, expected one of {sorted(SCHEMAS)}")
+    return name
+
+
+def iter_record_batches(json_path: str, schema: pa.Schema, chunk_rows: int = 200000) -> Iterator[pa.RecordBatch]:
+    """逐行解析 JSON，每 chunk_rows 行按 schema 组成一个 RecordBatch；缺失字段为 null，多余字段忽略"""
+    fields = schema.names
+    string_fields = {f.name for f in schema if pa.types.is_string(f.type)}
+
+    def to_batch(columns: Dict[str, List]) -> pa.RecordBatch:
+        return pa.RecordBatch.from_arrays([pa.array(columns[f], type=schema.field(f).type) for f in fields],
+                                          schema=schema)
+
+    columns: Dict[str, List] = {f: [] for f in fields}
+    n = 0
+    with open(json_path, 'r', encoding='utf-8') as json_file:
+        for line in json_file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            for f in fields:
+                value = record.get(f)
+                if f in string_fields and isinstance(value, (dict, list)):
+                    value = json.dumps(value, ensure_ascii=False)
+                columns[f].append(value)
+            n += 1
+            if n == chunk_rows:
+                yield to_batch(columns)
+                columns = {f: [] for f in fields}
+                n = 0
+    if n:
+        yield to_batch(columns)
+
+
+def json_to_parquet(json_path: str,
+                    out_dir: Optional[str] = None,
+                    chunk_rows: int = 200000,
+                    rows_per_file: int = 2000000,
+                    verbose: bool = True) -> str:
+    """
+    把一个 Yelp JSON lines 文件流式写成 Parquet 目录（part-00000.parquet, part-00001.parquet, ...）
+
+    同一时刻内存中只有一个 chunk；写入临时目录，全部完成后再替换 out_dir，中途失败不会留下半个数据集。
+    pd.read_parquet(out_dir) 即可读回整个表。
+
+    参数:
+    -------
+    json_path : str
+        ./data/json/yelp_academic_dataset_*.json
+    out_dir : str, optional
+        默认 ./data/parquet/yelp_academic_dataset_<name>
+    chunk_rows : int
+        每次解析并写出的行数（一个 row group）
+    rows_per_file : int
+        每个 part 文件的最大行数
+
+    返回:
+    -------
+    out_dir : str
+    """
+    name = dataset_name(json_path)
+    schema = SCHEMAS[name]
+    if out_dir is None:
+        out_dir = os.path.join('./data/parquet', 'yelp_academic_dataset_' + name)
+    tmp_dir = out_dir.rstrip('/\\') + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    start = time.perf_counter()
+    writer, part, rows_in_file, total = None, 0, 0, 0
+    try:
+        for batch in iter_record_batches(json_path, schema, chunk_rows):
+            if writer is None or rows_in_file >= rows_per_file:
+                if writer is not None:
+                    writer.close()
+                    part += 1
+                writer = pq.ParquetWriter(os.path.join(tmp_dir, f'part-{part:05d}.parquet'), schema)
+                rows_in_file = 0
+            writer.write_batch(batch)
+            rows_in_file += batch.num_rows
+            total += batch.num_rows
+            if verbose:
+                print(f"{json_path}: {total} rows, {total / (time.perf_counter() - start):.0f} rows/sec")
+    finally:
+        if writer is not None:
+            writer.close()
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    if verbose:
+        print("{} data save success ({} rows -> {})".format(json_path, total, out_dir))
+    return out_dir
+
+
+def protect_excel_formula(df: pd.DataFrame) -> pd.DataFrame:
+    """与 notebook 中的同名函数结果相同（以 = + - @ 开头的字符串前面加 '），按列向量化"""
+    for col in df.columns:
+        if not (df[col].dtype == object or pd.api.types.is_string_dtype(df[col])):
+            continue
+        try:
+            mask = df[col].str.startswith(('=', '+', '-', '@'), na=False).astype(bool)
+        except AttributeError:
+            # object 列里一个字符串都没有
+            continue
+        if mask.any():
+            df.loc[mask, col] = "'" + df.loc[mask, col].astype(str)
+    return df
+
+
+def export_excel(parquet_dir: str, excel_path: str, columns: Optional[List[str]] = None) -> str:
+    """
+    显式导出 Excel 时才做公式转义；超过 Excel 行数上限时与原 json_to_excel 一样改存 CSV
+
+    返回:
+    -------
+    实际写出的文件路径
+    """
+    df = protect_excel_formula(pd.read_parquet(parquet_dir, columns=columns))
+    if len(df) + 1 > EXCEL_MAX_ROWS:
+        excel_path = os.path.splitext(excel_path)[0] + '.csv'
+        df.to_csv(excel_path, index=False)
+    else:
+        df.to_excel(excel_path, index=False)
+    print("{} data save success".format(excel_path))
+    return excel_path
+
+
+if __name__ == "__main__":
+    import sys
+
+    # python yelp_parquet.py ./data/json ./data/parquet
+    json_dir = sys.argv[1] if len(sys.argv) > 1 else './data/json'
+    parquet_dir = sys.argv[2] if len(sys.argv) > 2 else './data/parquet'
+    for file_name in sorted(os.listdir(json_dir)):
+        try:
+            name = dataset_name(file_name)
+        except ValueError:
+            print("skip", file_name)
+            continue
+        json_to_parquet(os.path.join(json_dir, file_name),
+                        os.path.join(parquet_dir, 'yelp_academic_dataset_' + name))
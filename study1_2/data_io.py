@@ -0,0 +1,191 @@
+# data_io.py - 统一的数据表读写（带类型的 Parquet/Feather，xlsx/csv 自动生成 Parquet 旁路缓存）
+
+import os
+import warnings
+from typing import Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# 各阶段数据表中已知列的类型；未列出的列保持 pandas 推断的类型
+COLUMN_TYPES: Dict[str, str] = {
+    # 标识 / 文本
+    'photo_id': 'string', 'business_id': 'string', 'pic_filename': 'string', 'caption': 'string',
+    'label': 'string', 'objects_content': 'string', 'name': 'string', 'address': 'string',
+    'city': 'string', 'state': 'string', 'postal_code': 'string', 'categories': 'string',
+    'attributes': 'string', 'hours': 'string',
+    # 图片特征
+    'memory_score': 'float64', 'beauty_score': 'float64', 'average_hue': 'float64',
+    'average_saturation': 'float64', 'average_value': 'float64', 'sharpness_measure': 'float64',
+    'uniqueness_score': 'float64', 'var': 'float64',
+    # 商家特征
+    'stars': 'float64', 'star_avg': 'float64', 'star_std': 'float64', 'contents_score_avg': 'float64',
+    'useful_avg': 'float64', 'funny_avg': 'float64', 'cool_avg': 'float64',
+    'latitude': 'float64', 'longitude': 'float64',
+    # 计数（有缺失时保留 float64）
+    'number_face': 'int64', 'smiling_faces_count': 'int64', 'person_count': 'int64',
+    'person_exist': 'int64', 'person_total_count': 'int64', 'review_count': 'int64',
+    'is_open': 'int64', 'user_count': 'int64', 'categories_counts': 'int64', 'photo_count': 'int64',
+}
+
+# 旁路缓存文件中记录源文件状态的 metadata 键
+_SOURCE_KEY = b'data_io.source'
+
+EXCEL_SUFFIXES = ('.xlsx', '.xls')
+
+
+def apply_schema(df: pd.DataFrame, column_types: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+    """
+    按 COLUMN_TYPES（或给定的类型表）转换已知列的类型
+
+    整数列含缺失值时保留 float64（与 pd.read_excel 的结果一致），不引入 pandas 的可空整数类型
+    """
+    column_types = COLUMN_TYPES if column_types is None else column_types
+    for col, dtype in column_types.items():
+        if col not in df.columns:
+            continue
+        if dtype == 'string':
+            values = df[col]
+            df[col] = values.where(values.isna(), values.astype(str)).astype(object)
+        elif dtype == 'int64':
+            values = pd.to_numeric(df[col], errors='coerce')
+            df[col] = values.astype('int64') if values.notna().all() and (values % 1 == 0).all() else values
+        else:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype(dtype)
+    return df
+
+
+def _source_state(path: str) -> str:
+    # 旁路缓存总是按 COLUMN_TYPES 转换过类型，状态中带上 schema 标记，旧格式或未转换的缓存都视为过期
+    stat = os.stat(path)
+    return f'{stat.st_mtime_ns}:{stat.st_size}:schema'
+
+
+def sidecar_path(path: str) -> str:
+    """data/output/study1_2_res_data.xlsx -> data/output/study1_2_res_data.xlsx.parquet"""
+    return path + '.parquet'
+
+
+def _read_source(path: str) -> pd.DataFrame:
+    if path.endswith(EXCEL_SUFFIXES):
+        return pd.read_excel(path)
+    return pd.read_csv(path)
+
+
+def _to_arrow(df: pd.DataFrame) -> pa.Table:
+    """pyarrow 不接受混合类型的 object 列（如同一列既有数字又有字符串），这类列按字符串保存"""
+    mixed = [col for col in df.columns
+             if df[col].dtype == object and pd.api.types.infer_dtype(df[col], skipna=True).startswith('mixed')]
+    if mixed:
+        warnings.warn(f"mixed-type columns stored as strings: {mixed}")
+        df = df.copy()
+        for col in mixed:
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def write_table(df: pd.DataFrame, path: str, schema: bool = True,
+                metadata: Optional[Dict[bytes, bytes]] = None) -> str:
+    """
+    写出 .parquet 或 .feather（先写临时文件再改名）；Excel 只通过 export_excel 显式导出
+
+    参数:
+    -------
+    df : pd.DataFrame
+        数据表
+    path : str
+        输出路径，扩展名决定格式
+    schema : bool
+        是否先按 COLUMN_TYPES 转换列类型
+    """
+    if path.endswith(EXCEL_SUFFIXES):
+        raise ValueError(f"{path}: use export_excel for Excel output")
+    if schema:
+        df = apply_schema(df.copy())
+    table = _to_arrow(df)
+    if metadata:
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), **metadata})
+    tmp_path = path + '.tmp'
+    if path.endswith('.feather'):
+        import pyarrow.feather as feather
+        feather.write_feather(table, tmp_path)
+    else:
+        pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _sidecar_is_fresh(path: str, cache: str) -> bool:
+    if not os.path.exists(cache):
+        return False
+    try:
+        metadata = pq.read_schema(cache).metadata or {}
+    except Exception:
+        return False
+    return metadata.get(_SOURCE_KEY, b'').decode() == _source_state(path)
+
+
+def read_table(path: str, columns: Optional[List[str]] = None, schema: bool = True,
+               use_cache: bool = True) -> pd.DataFrame:
+    """
+    读取数据表，可只读部分列
+
+    - .parquet / .feather 直接按列读取
+    - .xlsx / .xls / .csv 第一次读取时解析原文件、按 COLUMN_TYPES 转换类型并写出旁路缓存
+      <原文件名>.parquet；之后原文件的 mtime 或大小不变就直接读缓存，改变后自动重建。
+      缓存只保存转换过类型的表，schema=False 时不使用缓存
+
+    参数:
+    -------
+    path : str
+        数据文件路径
+    columns : list, optional
+        只读取这些列
+    schema : bool
+        是否按 COLUMN_TYPES 转换列类型；False 时 xlsx/csv 直接解析原文件
+    use_cache : bool
+        False 时 xlsx/csv 每次都重新解析（不读也不写缓存）
+    """
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path, columns=columns)
+    if path.endswith('.feather'):
+        return pd.read_feather(path, columns=columns)
+
+    if not use_cache or not schema:
+        df = _read_source(path)
+        df = apply_schema(df) if schema else df
+        return df[columns] if columns is not None else df
+
+    cache = sidecar_path(path)
+    if not _sidecar_is_fresh(path, cache):
+        state = _source_state(path)
+        write_table(_read_source(path), cache, schema=True, metadata={_SOURCE_KEY: state.encode()})
+    return pd.read_parquet(cache, columns=columns)
+
+
+def export_excel(df: pd.DataFrame, path: str) -> str:
+    """显式导出 Excel（供人工查看或交付）；同时刷新该文件的旁路缓存，后续 read_table 不必重新解析"""
+    df.to_excel(path, index=False)
+    write_table(df, sidecar_path(path), schema=True, metadata={_SOURCE_KEY: _source_state(path).encode()})
+    return path
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    # python data_io.py data/output/study1_2_drink_data.xlsx
+    # 比较 pd.read_excel 与 read_table（第一次建缓存、之后读缓存）的耗时
+    for path in sys.argv[1:]:
+        start = time.perf_counter()
+        _read_source(path)
+        excel_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        read_table(path)
+        first_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        df = read_table(path)
+        cached_seconds = time.perf_counter() - start
+        print(f"{path}: {df.shape}, read_excel {excel_seconds:.2f}s, "
+              f"first read_table {first_seconds:.2f}s, cached {cached_seconds:.3f}s")
@@ -0,0 +1,164 @@
+# design_matrix.py - Study 1 模型族共用的设计矩阵（每个样本只构建一次，由调用方显式复用）
+
+from typing import Dict, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from cluster_robust import ClusterIndex
+
+CONTENT_DUMMIES = ['food', 'menu', 'inside', 'drink']
+
+# 标准化列 -> 原始列（与 notebook 中一样用 StandardScaler，在各自样本上拟合）
+SCALED_COLUMNS = {'average_hue_s': 'average_hue', 'average_saturation_s': 'average_saturation',
+                  'average_value_s': 'average_value', 'sharpness_measure_s': 'sharpness_measure'}
+
+# create_ols_model 中 X 的列顺序（不含 const）
+MAIN_COLUMNS = CONTENT_DUMMIES + ['average_hue_s', 'average_saturation_s', 'average_value_s',
+                                  'person_exist', 'var', 'person_total_count',
+                                  'beauty_score', 'sharpness_measure_s']
+
+# DesignMatrix.values 中的全部列；标准化列的原始值也保存下来，行子集可以在自身数组上重新标准化
+COLUMNS = ['const'] + MAIN_COLUMNS + ['hue_sin', 'hue_cos'] + list(SCALED_COLUMNS.values())
+
+
+def standardize(values: np.ndarray) -> np.ndarray:
+    """StandardScaler().fit_transform 的一维版本"""
+    return StandardScaler().fit_transform(values.reshape(-1, 1)).ravel()
+
+
+class DesignMatrix:
+    """
+    一个样本（all / restaurant / drink）的设计矩阵
+
+    所有模型用到的列（const、内容哑变量、标准化后的颜色与清晰度、其他控制变量、hue 的 sin/cos、
+    原始颜色与清晰度）放在一个 float64 数组 values 中，每列连续存放；各模型只按列名取需要的列，
+    不再对整张图片表做 get_dummies / concat / copy
+
+    构造时复制所需的列，之后与 data 无关：data 被原地修改不会影响已有的 DesignMatrix，
+    需要新数据时重新构造。同一样本上的多个模型应传入同一个 DesignMatrix
+
+    样本中没有某类内容图片时，values 中该哑变量列为 0，并记在 missing_labels 中；exog / select
+    默认对这样的列抛 KeyError（与 notebook 中 get_dummies 后按列名取列相同），只有显式传入
+    allow_missing_labels=True 才用全 0 列（notebook 中 conditional composition / nested 模型的做法）
+
+    参数:
+    -------
+    data : pd.DataFrame
+        图片表，需要 label, memory_score, business_id 以及 MAIN_COLUMNS 对应的原始列
+    """
+
+    def __init__(self, data: pd.DataFrame):
+        self.index = data.index
+        self.position: Dict[str, int] = {col: i for i, col in enumerate(COLUMNS)}
+        self.values = np.empty((len(data), len(COLUMNS)), dtype=np.float64, order='F')
+
+        self.values[:, self.position['const']] = 1.0
+        label = data['label'].to_numpy(dtype=object)
+        for col in CONTENT_DUMMIES:
+            self.values[:, self.position[col]] = label == col
+        for col in list(SCALED_COLUMNS.values()) + ['person_exist', 'var', 'person_total_count', 'beauty_score']:
+            self.values[:, self.position[col]] = data[col].to_numpy(dtype=np.float64)
+        theta = 2.0 * np.pi * self.values[:, self.position['average_hue']] / 180.0  # OpenCV hue 周期为 180
+        self.values[:, self.position['hue_sin']] = np.sin(theta)
+        self.values[:, self.position['hue_cos']] = np.cos(theta)
+
+        self.y = data['memory_score'].to_numpy(dtype=np.float64)
+        # business 聚类编码只算一次，所有聚类稳健标准误共用
+        self.codes, self.clusters = pd.factorize(data['business_id'])
+        self._finish()
+
+    def _finish(self) -> None:
+        """在当前行上拟合标准化列，重置由行决定的状态"""
+        for col, raw in SCALED_COLUMNS.items():
+            self.values[:, self.position[col]] = standardize(self.values[:, self.position[raw]])
+        self.missing_labels = [col for col in CONTENT_DUMMIES if not self.values[:, self.position[col]].any()]
+        self._cluster_index: Optional[ClusterIndex] = None
+        self._subsets: Dict[str, 'DesignMatrix'] = {}
+
+    def __len__(self) -> int:
+        return len(self.y)
+
+    @property
+    def n_clusters(self) -> int:
+        return len(self.clusters)
+
+    @property
+    def cluster_index(self) -> ClusterIndex:
+        """按 business 排序后的行顺序和分组边界，供 cluster_robust 使用"""
+        if self._cluster_index is None:
+            self._cluster_index = ClusterIndex(self.codes)
+        return self._cluster_index
+
+    def column(self, name: str) -> np.ndarray:
+        """某一列（视图，不复制）"""
+        return self.values[:, self.position[name]]
+
+    def check_labels(self, columns: Sequence[str], allow_missing_labels: bool = False) -> None:
+        """columns 中有样本里不存在的内容哑变量且未允许时抛 KeyError"""
+        missing = [col for col in columns if col in self.missing_labels]
+        if missing and not allow_missing_labels:
+            raise KeyError(f"content labels not present in the sample: {missing} "
+                           f"(pass allow_missing_labels=True to use all-zero dummies)")
+
+    def select(self, columns: Sequence[str], allow_missing_labels: bool = False) -> np.ndarray:
+        """按列名取出的 (n, k) 数组"""
+        self.check_labels(columns, allow_missing_labels)
+        return self.values[:, [self.position[col] for col in columns]]
+
+    def exog(self, columns: Sequence[str], extra: Optional[Dict[str, np.ndarray]] = None,
+             allow_missing_labels: bool = False) -> pd.DataFrame:
+        """
+        statsmodels 用的 X（列名即参数名）
+
+        参数:
+        -------
+        columns : list
+            列名，可以包含 extra 中的列
+        extra : dict, optional
+            不在 values 中的临时列，如旋转后的 hue
+        allow_missing_labels : bool
+            样本中没有某类内容图片时是否用全 0 的哑变量列，默认抛 KeyError
+        """
+        extra = extra or {}
+        self.check_labels([col for col in columns if col not in extra], allow_missing_labels)
+        X = np.empty((len(self), len(columns)), dtype=np.float64, order='F')
+        for i, col in enumerate(columns):
+            X[:, i] = extra[col] if col in extra else self.column(col)
+        return pd.DataFrame(X, index=self.index, columns=list(columns))
+
+    def endog(self) -> pd.Series:
+        return pd.Series(self.y, index=self.index, name='memory_score')
+
+    def subset(self, name: str, mask: np.ndarray) -> 'DesignMatrix':
+        """
+        行子集（如 person_exist == 1）的设计矩阵；标准化在子集上重新拟合，与原来先筛选再
+        StandardScaler 的做法一致，聚类编码按子集重新编号。只用本对象的数组，按 name 缓存
+        """
+        if name not in self._subsets:
+            mask = np.asarray(mask, dtype=bool)
+            child = DesignMatrix.__new__(DesignMatrix)
+            child.index = self.index[mask]
+            child.position = self.position
+            child.values = np.asfortranarray(self.values[mask])
+            child.y = self.y[mask]
+            child.codes, uniques = pd.factorize(self.codes[mask])
+            child.clusters = self.clusters.take(uniques)
+            child._finish()
+            self._subsets[name] = child
+        return self._subsets[name]
+
+    def rotated_hue(self, shift_deg: float) -> np.ndarray:
+        """hue 原点平移 shift_deg 度（模 180）后再标准化"""
+        return standardize((self.column('average_hue') - shift_deg) % 180.0)
+
+
+def design_matrix(data: Union[pd.DataFrame, DesignMatrix]) -> DesignMatrix:
+    """
+    模型函数的统一入口：传入 DesignMatrix 时直接使用，传入 DataFrame 时新构造一个
+
+    不按 DataFrame 缓存（原地修改过的样本会拿到过期的矩阵）；同一样本拟合多个模型时，
+    先 matrix = DesignMatrix(data)，再把 matrix 传给各模型函数
+    """
+    return data if isinstance(data, DesignMatrix) else DesignMatrix(data)
@@ -0,0 +1,215 @@
+# photo_data.py - 图片级数据处理（process_data 的向量化实现）
+
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def _count_tokens(content: str) -> Tuple[int, int]:
+    """与 process_data 循环体相同：长度 0/1 视为没有检测结果，否则按 ',' 拆分并 strip"""
+    if len(content) <= 1:
+        return 0, 0
+    tokens = [s.strip() for s in content.split(",")]
+    return tokens.count('person'), len(tokens)
+
+
+def object_counts(objects_content: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    每张图片的 person 个数和物体总数；每个不同的字符串只解析一次，再按编码展开到各行
+
+    参数:
+    -------
+    objects_content : pd.Series
+        YOLO 检测结果字符串（缺失值与原实现一样按 str(nan) == 'nan' 处理）
+
+    返回:
+    -------
+    person_count, total_count : np.ndarray (int64)
+    """
+    contents = np.array([str(x) for x in objects_content.astype(object).tolist()], dtype=object)
+    codes, uniques = pd.factorize(contents)
+    counts = np.array([_count_tokens(c) for c in uniques], dtype=np.int64).reshape(-1, 2)
+    return counts[codes, 0], counts[codes, 1]
+
+
+def process_data(df_open: pd.DataFrame) -> pd.DataFrame:
+    """
+    与 notebook 中的 process_data 结果一致：在 df_open 上添加 var, person_total_count,
+    person_total_count_cluster 三列，并返回 person_total_count != 0 的行
+
+    var = |person - 其他物体| / 物体总数（物体总数为 0 时为 0）
+    """
+    person, total = object_counts(df_open['objects_content'])
+    other = total - person
+    var = np.divide(np.abs(person - other), total, out=np.zeros(len(total)), where=total != 0)
+
+    df_open['var'] = var
+    df_open['person_total_count'] = total
+    df_open['person_total_count_cluster'] = np.where(df_open['person_total_count'] != 0, 1,
+                                                     df_open['person_total_count'])
+    filter_data = df_open[df_open['person_total_count'] != 0]
+    print("pre process data len:", len(df_open), "post process data len: ", len(filter_data))
+    return filter_data
+
+
+class PhotoGroups:
+    """
+    按 business_id 把图片表稳定排序一次，之后每个商家的统计量都在连续切片上计算
+
+    每个商家内部保持原来的行顺序，切片上的求和与 pic_df[pic_df['business_id']==business_id][col]
+    上的 pandas 求和逐位相同（都是 numpy 的 pairwise 求和）
+
+    参数:
+    -------
+    pic_df : pd.DataFrame
+        图片表
+    keys : list
+        分组列，默认只按 business_id；business_id 缺失的行不参与分组
+    """
+
+    def __init__(self, pic_df: pd.DataFrame, keys=('business_id',)):
+        self.pic_df = pic_df
+        self.keys = list(keys)
+        codes = np.zeros(len(pic_df), dtype=np.int64)
+        valid = np.ones(len(pic_df), dtype=bool)
+        for key in self.keys:
+            key_codes, key_uniques = pd.factorize(pic_df[key])
+            valid &= key_codes >= 0
+            codes = codes * (len(key_uniques) + 1) + key_codes
+        # 组的编号按第一次出现的顺序
+        group_codes, first_rows = np.unique(codes[valid], return_index=True)
+        order_of_groups = np.argsort(first_rows, kind='stable')
+        rank = np.empty(len(group_codes), dtype=np.int64)
+        rank[order_of_groups] = np.arange(len(group_codes))
+        group_of_row = rank[np.searchsorted(group_codes, codes[valid])]
+
+        self.rows = np.flatnonzero(valid)[np.argsort(group_of_row, kind='stable')]
+        sizes = np.bincount(group_of_row, minlength=len(group_codes))
+        self.ends = np.cumsum(sizes)
+        self.starts = self.ends - sizes
+        first = self.rows[self.starts]
+        self.index = pd.MultiIndex.from_frame(pic_df[self.keys].iloc[first].reset_index(drop=True)) \
+            if len(self.keys) > 1 else pd.Index(pic_df[self.keys[0]].iloc[first].to_numpy(), name=self.keys[0])
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def size(self) -> np.ndarray:
+        return self.ends - self.starts
+
+    def values(self, col: str) -> np.ndarray:
+        """按分组顺序排列的某列取值"""
+        return self.pic_df[col].to_numpy()[self.rows]
+
+    def count_equal(self, col: str, value) -> np.ndarray:
+        hits = np.concatenate([[0], np.cumsum(self.values(col) == value)])
+        return hits[self.ends] - hits[self.starts]
+
+    def sum(self, col: str) -> np.ndarray:
+        """等价于每组 Series.sum()（跳过缺失值）"""
+        values = self.values(col)
+        if values.dtype.kind == 'f':
+            values = np.where(np.isnan(values), 0, values)
+        return np.array([values[s:e].sum() for s, e in zip(self.starts, self.ends)])
+
+    def mean(self, col: str) -> np.ndarray:
+        """等价于每组 Series.mean()：float64 下求和再除以非缺失个数"""
+        values = self.values(col)
+        if values.dtype.kind == 'f':
+            present = ~np.isnan(values)
+            values = np.where(present, values, 0)
+            counts = np.concatenate([[0], np.cumsum(present)])
+            counts = counts[self.ends] - counts[self.starts]
+        else:
+            counts = self.size()
+        sums = np.array([values[s:e].sum(dtype=np.float64) for s, e in zip(self.starts, self.ends)],
+                        dtype=np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+    def max(self, col: str) -> np.ndarray:
+        """等价于每组 Series.max()（跳过缺失值，全部缺失时为 NaN）"""
+        values = self.values(col).astype(np.float64)
+        return np.fmax.reduceat(values, self.starts) if len(self) else np.empty(0)
+
+    def nunique(self, col: str) -> np.ndarray:
+        """等价于每组 len(Series.unique())（缺失值也算一个取值）"""
+        codes, _ = pd.factorize(self.pic_df[col], use_na_sentinel=False)
+        group_of_row = np.repeat(np.arange(len(self)), self.size())
+        pairs = np.unique(np.stack([group_of_row, codes[self.rows]]), axis=1)
+        return np.bincount(pairs[0], minlength=len(self))
+
+    def unique(self, col: str) -> list:
+        """每组按出现顺序的不重复取值（object 数组）"""
+        values = self.values(col)
+        return [np.asarray(pd.unique(pd.Series(values[s:e], dtype=object)), dtype=object)
+                for s, e in zip(self.starts, self.ends)]
+
+
+LABELS = ['food', 'drink', 'menu', 'inside', 'outside']
+
+
+def bus_pic_data_process(business_df: pd.DataFrame, pic_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    与 notebook 中的 bus_pic_data_process 结果逐位一致：每个商家的各类图片占比（round 3）、
+    person_exist（任一图片有人即为 1）、person_percentage、var / person_total_count / person_count
+    的均值（round 3），再与 business_df 按 business_id 合并
+
+    原实现对没有图片的商家会除零报错，这里直接跳过（合并时本来也会被去掉）
+    """
+    groups = PhotoGroups(pic_df)
+    business_ids = pd.Index(business_df['business_id'].unique())
+    business_ids = business_ids[business_ids.isin(groups.index)]
+    position = groups.index.get_indexer(business_ids)
+    size = groups.size()[position].tolist()
+
+    columns = {'business_id': business_ids.to_numpy()}
+    for label in LABELS:
+        # 与原实现一样对 Python float 做 round
+        count = groups.count_equal('label', label)[position].tolist()
+        columns[label] = [round(c / n, 3) for c, n in zip(count, size)]
+    columns['var'] = np.round(groups.mean('var')[position], 3)
+    columns['person_exist'] = (groups.count_equal('person_exist', 1)[position] > 0).astype(np.int64)
+    columns['person_percentage'] = groups.sum('person_exist')[position] / np.array(size)
+    columns['person_total_count'] = np.round(groups.mean('person_total_count')[position], 3)
+    columns['person_count'] = np.round(groups.mean('person_count')[position], 3)
+    pic_bus_df = pd.DataFrame(columns)[['business_id', 'food', 'drink', 'menu', 'inside', 'outside', 'var',
+                                        'person_exist', 'person_percentage', 'person_total_count', 'person_count']]
+    return pd.merge(business_df, pic_bus_df, on='business_id')
+
+
+def photos_summary(pic_df: pd.DataFrame,
+                   cols=('memory_score', 'h', 's', 'v'),
+                   labels=('inside', 'outside', 'menu', 'drink', 'food')) -> pd.DataFrame:
+    """
+    raw_business_data_process.ipynb 中注释掉的 photos_summary 的向量化实现
+
+    返回:
+    -------
+    result : pd.DataFrame
+        business_id, pic_count, pic_type_count, pic_type_content，以及每个 col × label 的
+        <col>_<label>_avg（np.sum / 图片数）和 <col>_<label>_max；该类图片不存在时两者为 0
+    """
+    business = PhotoGroups(pic_df)
+    result = {'business_id': business.index.to_numpy(),
+              'pic_count': business.nunique('photo_id'),
+              'pic_type_count': business.nunique('label'),
+              'pic_type_content': business.unique('label')}
+
+    pairs = PhotoGroups(pic_df, keys=('business_id', 'label'))
+    pair_business = pairs.index.get_level_values('business_id')
+    pair_label = pairs.index.get_level_values('label')
+    row = business.index.get_indexer(pair_business)
+    for col in cols:
+        avg = pairs.sum(col) / pairs.size()
+        high = pairs.max(col)
+        for label in labels:
+            mask = np.asarray(pair_label == label)
+            avg_col = np.zeros(len(business))
+            max_col = np.zeros(len(business))
+            avg_col[row[mask]] = avg[mask]
+            max_col[row[mask]] = high[mask]
+            result[col + '_' + label + '_avg'] = avg_col
+            result[col + '_' + label + '_max'] = max_col
+    return pd.DataFrame(result)
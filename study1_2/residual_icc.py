@@ -0,0 +1,118 @@
+# residual_icc.py - 残差 ICC / 设计效应（单因素 ANOVA 分解），多个模型的残差一次计算
+
+from typing import Dict, Union
+
+import numpy as np
+import pandas as pd
+
+from cluster_robust import ClusterIndex
+from design_matrix import DesignMatrix, design_matrix
+
+
+def residual_icc(residuals: np.ndarray, index: ClusterIndex) -> pd.DataFrame:
+    """
+    每一列残差的 ICC 和 DEFF，公式与 notebook 中的 compute_residual_icc 相同：
+    SSB = Σ n_g (均值_g - 总均值)²，SSW = Σ (r - 均值_g)²，
+    n0 = (n - Σ n_g² / n) / (k - 1)，ICC = (MSB - MSW) / (MSB + (n0 - 1) MSW)，DEFF = 1 + (n0 - 1) ICC
+
+    参数:
+    -------
+    residuals : np.ndarray
+        (n,) 或 (n, m)，每列一个模型的残差，行与 index 一一对应
+    index : ClusterIndex
+        business 聚类
+
+    返回:
+    -------
+    result : pd.DataFrame
+        每列一行：icc, deff, n, clusters, avg_cluster_size (n0), ssb, ssw
+    """
+    r = np.asarray(residuals, dtype=np.float64)
+    r = r[:, None] if r.ndim == 1 else r
+    n = r.shape[0]
+    k = index.n_clusters
+    sizes = index.sizes()
+
+    group_means = index.group_sums(r) / sizes[:, None]
+    grand_mean = r.mean(axis=0)
+    ssb = (sizes[:, None] * (group_means - grand_mean) ** 2).sum(axis=0)
+    # 组内离差在按聚类排序后的行上计算，组均值按组大小重复展开
+    within = r[index.order] - np.repeat(group_means, sizes, axis=0)
+    ssw = np.einsum('ij,ij->j', within, within)
+
+    msb = ssb / (k - 1)
+    msw = ssw / (n - k)
+    n0 = (n - (sizes.astype(np.float64) ** 2).sum() / n) / (k - 1)
+    icc = (msb - msw) / (msb + (n0 - 1) * msw)
+    return pd.DataFrame({'icc': icc, 'deff': 1 + (n0 - 1) * icc, 'n': n, 'clusters': k,
+                         'avg_cluster_size': n0, 'ssb': ssb, 'ssw': ssw})
+
+
+def _residuals(model) -> pd.Series:
+    # GLM 结果没有 resid，用响应残差 y - mu
+    return model.resid if hasattr(model, 'resid') else model.resid_response
+
+
+def models_icc(models: Dict[str, object], data: Union[pd.DataFrame, DesignMatrix]) -> pd.DataFrame:
+    """
+    多个模型的残差 ICC；残差行相同的模型（如同一样本上的各个稳健性模型）放在一起批量计算，
+    聚类编码取自样本的 DesignMatrix
+
+    参数:
+    -------
+    models : dict
+        名称 -> statsmodels 结果对象，残差（GLM 为响应残差）的索引须是 data 索引的子集
+    data : pd.DataFrame 或 DesignMatrix
+        拟合这些模型用的样本（已有 DesignMatrix 时直接传入，不再重新构造）
+
+    返回:
+    -------
+    result : pd.DataFrame
+        以模型名称为索引，列同 residual_icc
+    """
+    matrix = design_matrix(data)
+    codes = matrix.codes
+    batches: Dict[bytes, tuple] = {}
+    for name, model in models.items():
+        rows = matrix.index.get_indexer(_residuals(model).index)
+        if (rows < 0).any():
+            raise ValueError(f"{name}: residual index not found in data")
+        batches.setdefault(rows.tobytes(), (rows, []))[1].append(name)
+
+    parts = []
+    for rows, names in batches.values():
+        # 子样本上的编码可能不连续，ClusterIndex 只要求非负
+        index = ClusterIndex(codes[rows])
+        resid = np.column_stack([np.asarray(_residuals(models[name])) for name in names])
+        parts.append(residual_icc(resid, index).set_axis(names))
+    return pd.concat(parts).loc[list(models)]
+
+
+def compute_residual_icc(model, business_ids: pd.Series, sample_name: str) -> float:
+    """notebook 中 compute_residual_icc 的替代：同样的输出格式，返回 ICC"""
+    resid = model.resid
+    index = ClusterIndex.from_labels(business_ids.loc[resid.index])
+    row = residual_icc(resid.to_numpy(), index).iloc[0]
+    print(f"  {sample_name}: ICC = {row['icc']:.4f}, DEFF = {row['deff']:.2f} "
+          f"(n={int(row['n']):,}, clusters={int(row['clusters']):,}, avg_cluster_size={row['avg_cluster_size']:.1f})")
+    return row['icc']
+
+
+if __name__ == "__main__":
+    import sys
+
+    from data_io import read_table
+    from study1_models import (create_circular_hue_model, create_conditional_composition_model,
+                               create_fractional_logit, create_ols_model, fit_nested_models)
+
+    # python residual_icc.py <图片级样本文件>
+    # 同一样本上所有 Study 1 模型的残差 ICC / DEFF
+    data = DesignMatrix(read_table(sys.argv[1]))
+    nested_a, nested_b = fit_nested_models(data)
+    models = {'OLS': create_ols_model(data),
+              'Frac.Logit': create_fractional_logit(data),
+              'Cond.Comp': create_conditional_composition_model(data)[0],
+              'Circ.Hue': create_circular_hue_model(data)[0],
+              'Nested A': nested_a,
+              'Nested B': nested_b}
+    print(models_icc(models, data).to_string())
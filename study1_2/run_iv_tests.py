@@ -3,6 +3,7 @@
 import pandas as pd
 import numpy as np
 from iv_validity_tests import IVValidityTests
+from data_io import read_table
 
 
 def prepare_data(data: pd.DataFrame) -> pd.DataFrame:
@@ -24,7 +25,7 @@ def run_restaurant_iv_test():
     print("# RESTAURANT IV TEST")
     print("#" * 80)
 
-    data = pd.read_excel('data/output/study1_2_res_data.xlsx')
+    data = read_table('data/output/study1_2_res_data.xlsx')
     data = prepare_data(data)
 
     tester = IVValidityTests(
@@ -56,7 +57,7 @@ def run_business_iv_test():
     print("# BUSINESS ALL IV TEST")
     print("#" * 80)
 
-    data = pd.read_excel('data/output/study1_2_business_data.xlsx')
+    data = read_table('data/output/study1_2_business_data.xlsx')
     data = prepare_data(data)
 
     tester = IVValidityTests(
@@ -88,7 +89,7 @@ def run_drink_iv_test():
     print("# DRINK IV TEST")
     print("#" * 80)
 
-    data = pd.read_excel('data/output/study1_2_drink_data.xlsx')
+    data = read_table('data/output/study1_2_drink_data.xlsx')
     data = prepare_data(data)
 
     tester = IVValidityTests(
@@ -0,0 +1,99 @@
+# study1_models.py - Study 1 主模型与稳健性模型（同一样本的模型可共用一个 DesignMatrix）
+
+from typing import Tuple, Union
+
+import pandas as pd
+import statsmodels.api as sm
+
+from cluster_robust import cluster_results
+from design_matrix import CONTENT_DUMMIES, MAIN_COLUMNS, DesignMatrix, design_matrix
+
+# 各模型函数的样本参数：图片表，或由它构造好的 DesignMatrix（多个模型共用时避免重复构造）
+Sample = Union[pd.DataFrame, DesignMatrix]
+
+COLOR_COLUMNS = ['average_saturation_s', 'average_value_s']
+OTHER_CONTROLS = ['person_exist', 'var', 'person_total_count', 'beauty_score', 'sharpness_measure_s']
+
+
+def _fit_ols(matrix, columns, extra=None, allow_missing_labels=False):
+    # 与 notebook 相同：business 聚类稳健标准误（用样本缓存的聚类边界计算）
+    model = sm.OLS(matrix.endog(), matrix.exog(['const'] + list(columns), extra, allow_missing_labels))
+    return cluster_results(model.fit(), matrix.cluster_index)
+
+
+def create_ols_model(data: Sample):
+    """主模型：内容哑变量 + 标准化颜色 + 人物 / 构图 / 美学 / 清晰度控制变量"""
+    return _fit_ols(design_matrix(data), MAIN_COLUMNS)
+
+
+def create_fractional_logit(data: Sample):
+    """Fractional logit（GLM Binomial，quasi-MLE），因变量在 [0, 1] 内的稳健性检验"""
+    matrix = design_matrix(data)
+    model = sm.GLM(matrix.endog(), matrix.exog(['const'] + MAIN_COLUMNS), family=sm.families.Binomial())
+    return cluster_results(model.fit(), matrix.cluster_index)
+
+
+def create_conditional_composition_model(data: Sample) -> Tuple[object, int, int]:
+    """
+    只用 person_exist == 1 的图片（此时 var 是有人图片中的构图不平衡度），person_exist 为常数不进入模型；
+    与 notebook 相同，子样本中没有的内容类别用全 0 哑变量
+
+    返回:
+    -------
+    model, 子样本图片数, 子样本商家数
+    """
+    matrix = design_matrix(data)
+    matrix = matrix.subset('person_exist', matrix.column('person_exist') == 1)
+    columns = [c for c in MAIN_COLUMNS if c != 'person_exist']
+    return _fit_ols(matrix, columns, allow_missing_labels=True), len(matrix), matrix.n_clusters
+
+
+def create_circular_hue_model(data: Sample):
+    """用 hue 的 sin / cos 替代线性 hue，并对两者做联合 Wald 检验"""
+    columns = CONTENT_DUMMIES + ['hue_sin', 'hue_cos'] + COLOR_COLUMNS + OTHER_CONTROLS
+    model = _fit_ols(design_matrix(data), columns)
+    wald = model.wald_test("hue_sin = 0, hue_cos = 0", scalar=True)
+    return model, wald
+
+
+def fit_rotated_linear_hue(data: Sample, shift_deg: float):
+    """hue 原点平移 shift_deg 度（模 180）后重新标准化，作为 average_hue_rot_s 拟合主模型"""
+    matrix = design_matrix(data)
+    columns = CONTENT_DUMMIES + ['average_hue_rot_s'] + COLOR_COLUMNS + OTHER_CONTROLS
+    return _fit_ols(matrix, columns, {'average_hue_rot_s': matrix.rotated_hue(shift_deg)})
+
+
+def fit_nested_models(data: Sample):
+    """
+    Model A：不含内容哑变量；Model B：与主模型相同（与 notebook 相同，样本中没有的内容类别用全 0 哑变量）。
+    比较两者 person_exist 的系数
+
+    返回:
+    -------
+    model_a, model_b
+    """
+    matrix = design_matrix(data)
+    model_a = _fit_ols(matrix, [c for c in MAIN_COLUMNS if c not in CONTENT_DUMMIES])
+    model_b = _fit_ols(matrix, MAIN_COLUMNS, allow_missing_labels=True)
+    return model_a, model_b
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    from data_io import read_table
+
+    # python study1_models.py data/output/study1_2_drink_data.xlsx
+    data = read_table(sys.argv[1] if len(sys.argv) > 1 else 'data/output/study1_2_drink_data.xlsx')
+    start = time.perf_counter()
+    data = DesignMatrix(data)
+    ols = create_ols_model(data)
+    create_fractional_logit(data)
+    create_conditional_composition_model(data)
+    create_circular_hue_model(data)
+    for shift in [0, 30, 60, 90, 120, 150]:
+        fit_rotated_linear_hue(data, shift)
+    fit_nested_models(data)
+    print(ols.summary())
+    print(f"all Study 1 models fitted in {time.perf_counter() - start:.2f}s")